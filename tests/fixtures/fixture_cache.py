@@ -0,0 +1,9 @@
+import pytest
+from core.runner import isolated_cache
+
+
+@pytest.fixture(autouse=True, scope='session')
+def _isolated_cache():
+    """Кэш тестов во временном каталоге, а не в рабочем cache.sqlite3."""
+    with isolated_cache() as directory:
+        yield directory
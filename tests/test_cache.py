@@ -0,0 +1,16 @@
+import os
+
+from django.core.cache import cache
+
+from yatube.settings import CACHES
+
+
+class TestCacheLocation:
+
+    def test_tests_do_not_use_live_cache(self):
+        live = CACHES['default']['LOCATION']
+        cache.set('test_cache_location', 1)
+        assert os.path.realpath(cache.path) != os.path.realpath(live), (
+            'Тесты не должны писать в рабочий файл кэша '
+            f'`{live}`: проверьте фикстуру `_isolated_cache`'
+        )
@@ -0,0 +1,19 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'name',
+        'status',
+        'run_at',
+        'attempts',
+        'max_attempts',
+    )
+    list_filter = ('status',)
+    search_fields = ('name',)
+    readonly_fields = ('worker', 'last_error', 'created')
+    empty_value_display = '-пусто-'
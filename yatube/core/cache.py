@@ -0,0 +1,185 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite (WAL), общий для всех процессов на одном хосте.
+
+    LOCATION — путь к файлу базы. Целые числа хранятся как INTEGER,
+    поэтому incr выполняется одним UPDATE под блокировкой записи;
+    остальные значения сериализуются pickle. Просроченные записи
+    не отдаются и удаляются при периодической чистке.
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+    cull_every = 100
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def _db(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None
+            )
+            local.connection.execute('PRAGMA journal_mode=WAL')
+            local.connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                local.connection.execute(statement)
+            local.pid = os.getpid()
+        return local.connection
+
+    def _encode(self, value):
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _decode(self, value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @contextmanager
+    def _transaction(self):
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        self._writes += 1
+        if self._writes % self.cull_every == 0:
+            self._cull()
+
+    def _cull(self):
+        db = self._db
+        db.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+        )
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            db.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                (count // self._cull_frequency,),
+            )
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        names = {self._key(key, version): key for key in keys}
+        found = {}
+        keys = list(names)
+        # Старые сборки SQLite ограничивают число параметров запроса 999.
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self._db.execute(
+                'SELECT key, value FROM cache WHERE key IN '
+                f'({",".join("?" * len(chunk))}) '
+                'AND (expires IS NULL OR expires > ?)',
+                [*chunk, time.time()],
+            )
+            for key, value in rows:
+                found[names[key]] = self._decode(value)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self._key(key, version), self._encode(value), expires)
+            for key, value in data.items()
+        ]
+        with self._transaction() as db:
+            db.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                rows,
+            )
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._transaction() as db:
+            db.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time()),
+            )
+            return db.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (key, self._encode(value), self.get_backend_timeout(timeout)),
+            ).rowcount > 0
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._transaction() as db:
+            return db.execute(
+                'UPDATE cache SET expires = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), self._key(key, version),
+                 time.time()),
+            ).rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._transaction() as db:
+            updated = db.execute(
+                'UPDATE cache SET value = value + ? WHERE key = ? '
+                "AND typeof(value) = 'integer' "
+                'AND (expires IS NULL OR expires > ?)',
+                (delta, key, time.time()),
+            ).rowcount
+            if not updated:
+                raise ValueError(f"Key '{key}' not found")
+            return db.execute(
+                'SELECT value FROM cache WHERE key = ?', (key,)
+            ).fetchone()[0]
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        rows = [(self._key(key, version),) for key in keys]
+        with self._transaction() as db:
+            db.executemany('DELETE FROM cache WHERE key = ?', rows)
+
+    def has_key(self, key, version=None):
+        return key in self.get_many([key], version=version)
+
+    def clear(self):
+        with self._transaction() as db:
+            db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт весь срок потока: открывать файл и проверять
+        # схему на каждый запрос дороже, чем держать его открытым.
+        pass
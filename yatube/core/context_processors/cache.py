@@ -0,0 +1,11 @@
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from core import generation
+
+
+def cache_generation(request):
+    return {
+        'cache_generation': SimpleLazyObject(generation.get),
+        'cache_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+    }
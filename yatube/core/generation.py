@@ -0,0 +1,35 @@
+import time
+
+from django.core.cache import cache
+
+KEY = 'content:generation'
+
+
+def _initial():
+    # Начальное значение от времени: после сброса кэша поколения
+    # не повторяют уже использованные в ключах.
+    return time.time_ns()
+
+
+def get():
+    value = cache.get(KEY)
+    if value is None:
+        cache.add(KEY, _initial(), timeout=None)
+        value = cache.get(KEY)
+    return value
+
+
+def bump():
+    try:
+        return cache.incr(KEY)
+    except ValueError:
+        cache.add(KEY, _initial(), timeout=None)
+        return cache.get(KEY)
+
+
+def get_with(key):
+    """Поколение и значение key одним обращением к кэшу."""
+    found = cache.get_many([KEY, key])
+    if KEY not in found:
+        return get(), None
+    return found[KEY], found.get(key)
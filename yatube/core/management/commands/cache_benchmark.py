@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache import SQLiteCache
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость SQLiteCache с LocMem и файловым кэшем'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-n', '--operations', type=int, default=2000,
+            help='Число операций каждого вида',
+        )
+
+    def handle(self, *args, **options):
+        count = options['operations']
+        directory = tempfile.mkdtemp()
+        params = {'OPTIONS': {'MAX_ENTRIES': count * 2}}
+        backends = {
+            'locmem': LocMemCache('benchmark', params),
+            'filebased': FileBasedCache(
+                os.path.join(directory, 'files'), params
+            ),
+            'sqlite': SQLiteCache(
+                os.path.join(directory, 'cache.sqlite3'), params
+            ),
+        }
+        keys = [f'key_{i}' for i in range(count)]
+        value = {'text': 'x' * 200, 'ids': list(range(20))}
+        self.stdout.write(
+            f'{"backend":<10} {"set":>10} {"get":>10} '
+            f'{"get_many":>10} {"incr":>10}   (операций/с)'
+        )
+        try:
+            for name, cache in backends.items():
+                cache.set('counter', 0)
+                results = [
+                    self.measure(lambda key: cache.set(key, value), keys),
+                    self.measure(cache.get, keys),
+                    self.measure(
+                        cache.get_many,
+                        [keys[i:i + 10] for i in range(0, count, 10)],
+                        per_call=10,
+                    ),
+                    self.measure(lambda key: cache.incr('counter'), keys),
+                ]
+                self.stdout.write(f'{name:<10} ' + ' '.join(
+                    f'{result:>10.0f}' for result in results
+                ))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    @staticmethod
+    def measure(operation, arguments, per_call=1):
+        start = time.perf_counter()
+        for argument in arguments:
+            operation(argument)
+        return len(arguments) * per_call / (time.perf_counter() - start)
@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait,
+)
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи из очереди core.tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-w', '--workers', type=int, default=settings.TASK_WORKERS,
+            help='Сколько задач выполнять одновременно',
+        )
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Пул процессов вместо пула потоков',
+        )
+        parser.add_argument(
+            '--poll', type=float, default=settings.TASK_POLL_INTERVAL,
+            help='Пауза в секундах между проверками пустой очереди',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться',
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        executor = ProcessPoolExecutor if options['processes'] else (
+            ThreadPoolExecutor
+        )
+        done = failed = 0
+        running = set()
+        with executor(workers) as pool:
+            try:
+                while True:
+                    free = workers - len(running)
+                    claimed = tasks.claim(free) if free else []
+                    if claimed and options['processes']:
+                        # Дочерние процессы не должны унаследовать
+                        # открытые соединения с БД.
+                        connections.close_all()
+                    for pk in claimed:
+                        running.add(pool.submit(tasks.run, pk))
+                    if not running:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll'])
+                        continue
+                    finished, running = wait(
+                        running, timeout=options['poll'],
+                        return_when=FIRST_COMPLETED,
+                    )
+                    for future in finished:
+                        done += 1
+                        failed += not future.result()
+            except KeyboardInterrupt:
+                self.stdout.write('Остановка: ждём выполняемые задачи')
+                wait(running)
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено задач: {done}, с ошибкой: {failed}'
+        ))
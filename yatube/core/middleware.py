@@ -0,0 +1,144 @@
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.utils.cache import (
+    get_conditional_response, patch_vary_headers, quote_etag,
+)
+from django.utils.http import http_date, parse_http_date_safe
+
+from core import generation
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class QueryBudgetMiddleware:
+    """Считает запросы к БД и время SQL на каждый запрос.
+
+    Лимиты задаются в settings.QUERY_BUDGETS по имени URL
+    ('posts:index'). При превышении пишет предупреждение в лог, а при
+    QUERY_BUDGET_STRICT = True (в тестах) выбрасывает QueryBudgetExceeded.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        match = request.resolver_match
+        view_name = match.view_name if match else None
+        request.query_count = counter.count
+        request.query_duration = counter.duration
+        if settings.DEBUG:
+            response['Server-Timing'] = (
+                f'db;desc="{counter.count} queries";'
+                f'dur={counter.duration * 1000:.1f}'
+            )
+        budget = settings.QUERY_BUDGETS.get(view_name)
+        if budget is not None and counter.count > budget:
+            message = (
+                f'{view_name}: {counter.count} запросов к БД '
+                f'({counter.duration * 1000:.1f} мс) при лимите {budget}'
+            )
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class AnonymousPageCacheMiddleware:
+    """Кэш целых страниц для анонимных посетителей.
+
+    Кэшируются GET/HEAD-запросы к представлениям из
+    settings.PAGE_CACHE_VIEWS без cookie сессии и CSRF. Копия хранит
+    поколение содержимого (core.generation), на котором была собрана:
+    любое изменение постов и комментариев делает её устаревшей.
+    Поколение и копия читаются одним запросом к кэшу. Ответы несут ETag
+    и Last-Modified, повторный запрос с ними получает 304.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        key = getattr(request, 'page_cache_key', None)
+        if (
+            key is None
+            or response.status_code != 200
+            or response.streaming
+            or response.cookies
+        ):
+            return response
+        etag = quote_etag(hashlib.md5(response.content).hexdigest())
+        # Ленты RSS/Atom сами ставят Last-Modified по последнему посту.
+        last_modified = parse_http_date_safe(
+            response.get('Last-Modified', '')
+        ) or int(time.time())
+        cache.set(
+            key,
+            (
+                request.page_cache_generation, response.content,
+                response['Content-Type'], etag, last_modified,
+            ),
+            settings.PAGE_CACHE_TIMEOUT,
+        )
+        self.patch(response, etag, last_modified)
+        return get_conditional_response(
+            request, etag=etag, last_modified=last_modified,
+            response=response,
+        )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method not in ('GET', 'HEAD')
+            or request.resolver_match.view_name
+            not in settings.PAGE_CACHE_VIEWS
+            or settings.SESSION_COOKIE_NAME in request.COOKIES
+            or settings.CSRF_COOKIE_NAME in request.COOKIES
+        ):
+            return None
+        url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        key = f'page:{url}'
+        current, cached = generation.get_with(key)
+        if cached is None or cached[0] != current:
+            request.page_cache_key = key
+            request.page_cache_generation = current
+            return None
+        _, content, content_type, etag, last_modified = cached
+        response = HttpResponse(content, content_type=content_type)
+        self.patch(response, etag, last_modified)
+        return get_conditional_response(
+            request, etag=etag, last_modified=last_modified,
+            response=response,
+        )
+
+    @staticmethod
+    def patch(response, etag, last_modified):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Cookie',))
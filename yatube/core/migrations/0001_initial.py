@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:46
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='Функция')),
+                ('payload', models.TextField(verbose_name='Аргументы (JSON)')),
+                ('key', models.CharField(blank=True, max_length=255, null=True, unique=True, verbose_name='Ключ дедупликации')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Состояние')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время запуска')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('max_attempts', models.PositiveSmallIntegerField(verbose_name='Лимит попыток')),
+                ('worker', models.CharField(blank=True, max_length=32, verbose_name='Захвачена')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+            ],
+            options={
+                'verbose_name': 'Задача',
+                'verbose_name_plural': 'Задачи',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['status', 'run_at'], name='task_status_run_at_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """Отложенный вызов функции, помеченной core.tasks.task."""
+    PENDING = 'pending'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ожидает'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Функция', max_length=255)
+    payload = models.TextField('Аргументы (JSON)')
+    key = models.CharField(
+        'Ключ дедупликации',
+        max_length=255,
+        unique=True,
+        blank=True,
+        null=True,
+    )
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=PENDING
+    )
+    run_at = models.DateTimeField('Время запуска', default=timezone.now)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Лимит попыток')
+    worker = models.CharField('Захвачена', max_length=32, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Дата создания', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        indexes = [
+            models.Index(fields=['status', 'run_at'],
+                         name='task_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
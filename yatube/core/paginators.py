@@ -0,0 +1,122 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу сортировки (keyset) без COUNT и OFFSET.
+
+    Страница выбирается непрозрачным курсором ?after= / ?before=,
+    закодированным из значений полей ordering последней/первой записи.
+    """
+    keyset = True
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        super().__init__(object_list, per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+
+    def encode_cursor(self, obj):
+        values = []
+        for name in self.fields:
+            value = getattr(obj, self._field(name).attname)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            values = json.loads(raw.decode())
+            if len(values) != len(self.fields):
+                raise ValueError
+            return [
+                self._field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (binascii.Error, ValueError, TypeError, ValidationError):
+            raise InvalidCursor('Некорректный курсор')
+
+    def _field(self, name):
+        return self.object_list.model._meta.get_field(name)
+
+    def _keyset(self, values, backwards):
+        condition = Q()
+        for position, name in enumerate(self.ordering):
+            descending = name.startswith('-') != backwards
+            lookup = '__lt' if descending else '__gt'
+            equal = dict(zip(self.fields[:position], values[:position]))
+            equal[self.fields[position] + lookup] = values[position]
+            condition |= Q(**equal)
+        # Избыточная граница по первому полю позволяет БД искать по
+        # индексу диапазоном, а не фильтровать его полный просмотр.
+        descending = self.ordering[0].startswith('-') != backwards
+        bound = self.fields[0] + ('__lte' if descending else '__gte')
+        return Q(**{bound: values[0]}) & condition
+
+    def query(self, values, backwards=False):
+        """Записи за курсором values в порядке обхода."""
+        queryset = self.object_list.order_by(*self.ordering)
+        if values is not None:
+            queryset = queryset.filter(self._keyset(values, backwards))
+        if backwards:
+            queryset = queryset.reverse()
+        return queryset
+
+    def fetch(self, values, backwards, limit):
+        return list(self.query(values, backwards)[:limit])
+
+    def page(self, after=None, before=None):
+        backwards = before is not None
+        cursor = before if backwards else after
+        values = None if cursor is None else self.decode_cursor(cursor)
+        rows = self.fetch(values, backwards, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        del rows[self.per_page:]
+        if backwards:
+            rows.reverse()
+        page = Page(rows, 1, self)
+        has_next = has_more if not backwards else bool(rows)
+        has_previous = has_more if backwards else cursor is not None
+        page.next_cursor = (
+            self.encode_cursor(rows[-1]) if has_next and rows else None
+        )
+        page.previous_cursor = (
+            self.encode_cursor(rows[0]) if has_previous and rows else None
+        )
+        return page
+
+    def get_page(self, after=None, before=None):
+        try:
+            return self.page(after=after, before=before)
+        except InvalidCursor:
+            return self.page()
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator для админки больших таблиц без точного COUNT(*).
+
+    Без фильтров число строк оценивается по MAX(id), который берётся из
+    индекса первичного ключа. Отфильтрованная выборка считается не
+    дальше count_limit строк: остальные страницы всё равно никто
+    не пролистывает.
+    """
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list.order_by()
+        if not queryset.query.where:
+            return queryset.aggregate(estimate=Max('pk'))['estimate'] or 0
+        return queryset[:self.count_limit].count()
@@ -0,0 +1,43 @@
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+@contextmanager
+def isolated_cache():
+    """Переносит файлы всех кэшей во временный каталог на время блока.
+
+    Нужен и manage.py test, и py.test: cache.clear() и страницы,
+    собранные из тестовой базы, не должны попадать в рабочий кэш.
+    """
+    directory = tempfile.mkdtemp(prefix='yatube_cache_')
+    try:
+        with override_settings(CACHES={
+            alias: {**options, 'LOCATION': f'{directory}/{alias}'}
+            for alias, options in settings.CACHES.items()
+        }):
+            yield directory
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+    """Запуск тестов с QUERY_BUDGET_STRICT = True и отдельным файлом кэша.
+
+    Превышение лимита запросов любым представлением роняет тест. Кэш
+    каждого запуска лежит во временном каталоге (см. isolated_cache).
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_BUDGET_STRICT = True
+        self.cache_isolation = isolated_cache()
+        self.cache_isolation.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_isolation.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
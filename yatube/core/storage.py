@@ -0,0 +1,58 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# os.umask нельзя прочитать, не изменив; читаем один раз при импорте,
+# пока процесс не запустил потоки.
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, где имя файла — SHA-256 его содержимого.
+
+    Одинаковые загрузки сохраняются один раз: 'posts/small.gif' становится
+    'posts/3f/3f…a1.gif'. Файл по такому имени никогда не меняется,
+    поэтому его URL можно кэшировать навсегда.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя определяется содержимым в _save.
+        return name
+
+    def _save(self, name, content):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        os.makedirs(self.path(directory), exist_ok=True)
+        digest = hashlib.sha256()
+        descriptor, temporary = tempfile.mkstemp(dir=self.path(directory))
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = os.path.join(
+                directory, hexdigest[:2], hexdigest + extension
+            )
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                return name.replace('\\', '/')
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            # mkstemp создаёт файл с правами 0600; права выставляются
+            # так же, как у FileSystemStorage.
+            mode = self.file_permissions_mode
+            os.chmod(
+                temporary, 0o666 & ~UMASK if mode is None else mode
+            )
+            # Одновременная запись того же содержимого безопасна:
+            # replace атомарен, а файлы совпадают байт в байт.
+            os.replace(temporary, full_path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        return name.replace('\\', '/')
@@ -0,0 +1,123 @@
+import json
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+
+def task(func):
+    """Помечает функцию как задачу очереди.
+
+    Воркер выполняет только помеченные функции; аргументы задачи
+    должны сериализоваться в JSON.
+    """
+    func.task_name = f'{func.__module__}.{func.__qualname__}'
+    return func
+
+
+def enqueue(func, args=(), kwargs=None, key=None, run_at=None):
+    """Ставит вызов func в очередь в текущей транзакции.
+
+    Задача появляется для воркера вместе с фиксацией изменений, ради
+    которых поставлена. Пока задача с тем же key не выполнена успешно,
+    новая не создаётся. run_at откладывает запуск. При TASKS_EAGER = True
+    задача выполняется сразу.
+    """
+    enqueue_many(func, [(args, key)], kwargs, run_at)
+
+
+def enqueue_many(func, calls, kwargs=None, run_at=None):
+    """Ставит вызовы func одним запросом; calls — пары (args, key)."""
+    items = []
+    for args, key in calls:
+        payload = json.dumps(
+            [list(args), kwargs or {}], cls=DjangoJSONEncoder
+        )
+        if settings.TASKS_EAGER:
+            call_args, call_kwargs = json.loads(payload)
+            func(*call_args, **call_kwargs)
+            continue
+        items.append(Task(
+            name=func.task_name,
+            payload=payload,
+            key=key,
+            run_at=run_at or timezone.now(),
+            max_attempts=settings.TASK_MAX_ATTEMPTS,
+        ))
+    if items:
+        Task.objects.bulk_create(items, ignore_conflicts=True)
+
+
+def claim(limit):
+    """Захватывает до limit готовых задач и возвращает их id.
+
+    Захват продлевает run_at на TASK_LEASE секунд: задачу упавшего
+    воркера по истечении срока подхватит другой. Ключ остаётся за
+    задачей до успешного выполнения: повторы и окончательная ошибка
+    не дают поставить ту же работу второй раз.
+    """
+    now = timezone.now()
+    ready = Task.objects.filter(status=Task.PENDING, run_at__lte=now)
+    ids = list(ready.order_by('run_at', 'pk').values_list(
+        'pk', flat=True
+    )[:limit])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    ready.filter(pk__in=ids).update(
+        worker=token,
+        run_at=now + timedelta(seconds=settings.TASK_LEASE),
+        attempts=F('attempts') + 1,
+    )
+    return list(Task.objects.filter(pk__in=ids, worker=token).values_list(
+        'pk', flat=True
+    ))
+
+
+def run(pk):
+    """Выполняет захваченную задачу; возвращает True при успехе.
+
+    Выполненная задача удаляется. Упавшая откладывается на
+    TASK_RETRY_DELAY * 2 ** (попытка - 1) секунд, а после
+    max_attempts попыток остаётся в таблице с состоянием «Ошибка».
+    """
+    item = Task.objects.filter(pk=pk).first()
+    if item is None:
+        return False
+    try:
+        func = import_string(item.name)
+        if getattr(func, 'task_name', None) != item.name:
+            raise ValueError(f'{item.name} не помечена как задача')
+        args, kwargs = json.loads(item.payload)
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Задача %s (%s) завершилась ошибкой', pk, item.name)
+        fail(item, traceback.format_exc())
+        return False
+    else:
+        Task.objects.filter(pk=pk).delete()
+        return True
+    finally:
+        close_old_connections()
+
+
+def fail(item, error):
+    tasks = Task.objects.filter(pk=item.pk)
+    if item.attempts >= item.max_attempts:
+        tasks.update(status=Task.FAILED, last_error=error)
+        return
+    delay = settings.TASK_RETRY_DELAY * 2 ** (item.attempts - 1)
+    tasks.update(
+        run_at=timezone.now() + timedelta(seconds=delay), last_error=error
+    )
@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from core.cache import SQLiteCache
+from core.runner import isolated_cache
+
+
+def increment(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_get_set_delete(self):
+        self.cache.set('key', {'value': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'value': [1, 2]})
+        self.assertTrue(self.cache.has_key('key'))
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_get_many_set_many(self):
+        self.cache.set_many({'a': 1, 'b': 'два', 'c': None})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c', 'missing']),
+            {'a': 1, 'b': 'два', 'c': None}
+        )
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'c': None})
+
+    def test_add_and_incr(self):
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 5))
+        self.assertEqual(self.cache.incr('counter', 10), 11)
+        self.assertEqual(self.cache.decr('counter'), 10)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_ttl(self):
+        self.cache.set('short', 'value', timeout=0.05)
+        self.cache.set('forever', 'value', timeout=None)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertTrue(self.cache.add('short', 'new'))
+        self.assertEqual(self.cache.get('forever'), 'value')
+
+    def test_cull(self):
+        cache = SQLiteCache(
+            self.path, {'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2}}
+        )
+        cache.cull_every = 1
+        for i in range(30):
+            cache.set(f'key_{i}', i)
+        self.assertLessEqual(len(cache.get_many(
+            [f'key_{i}' for i in range(30)]
+        )), 20)
+
+    def test_shared_between_processes(self):
+        """incr атомарен для нескольких процессов с одним файлом"""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=increment, args=(self.path, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+
+class IsolatedCacheTest(SimpleTestCase):
+    def test_cache_moved_to_temporary_directory(self):
+        """Кэш тестов не пишет в файл из настроек и убирается за собой"""
+        before = cache.path
+        self.assertEqual(before, settings.CACHES['default']['LOCATION'])
+        with isolated_cache() as directory:
+            self.assertTrue(cache.path.startswith(directory))
+            cache.set('key', 'value')
+            self.assertTrue(os.path.exists(cache.path))
+        self.assertFalse(os.path.exists(directory))
+        self.assertEqual(cache.path, before)
@@ -0,0 +1,140 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core import tasks
+from core.models import Task
+
+User = get_user_model()
+
+CALLS = []
+
+
+@tasks.task
+def record(value):
+    CALLS.append(value)
+
+
+@tasks.task
+def explode():
+    raise RuntimeError('Ошибка задачи')
+
+
+def not_a_task():
+    pass
+
+
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_key_deduplicates_pending_tasks(self):
+        tasks.enqueue(record, ['a'], key='record')
+        tasks.enqueue(record, ['b'], key='record')
+        self.assertEqual(Task.objects.count(), 1)
+        [pk] = tasks.claim(10)
+        tasks.enqueue(record, ['c'], key='record')
+        self.assertEqual(Task.objects.count(), 1)
+        self.assertTrue(tasks.run(pk))
+        self.assertEqual(CALLS, ['a'])
+        self.assertFalse(Task.objects.exists())
+        tasks.enqueue(record, ['d'], key='record')
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_key_kept_while_task_retries(self):
+        """Задача с ключом не дублируется ни при повторе, ни после ошибки"""
+        with self.settings(TASK_MAX_ATTEMPTS=2):
+            tasks.enqueue(explode, key='explode')
+        [pk] = tasks.claim(10)
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.assertFalse(tasks.run(pk))
+        tasks.enqueue(explode, key='explode')
+        self.assertEqual(Task.objects.count(), 1)
+        Task.objects.filter(pk=pk).update(run_at=timezone.now())
+        tasks.claim(10)
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.assertFalse(tasks.run(pk))
+        tasks.enqueue(explode, key='explode')
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+
+    def test_scheduled_task_waits(self):
+        tasks.enqueue(
+            record, ['later'], run_at=timezone.now() + timedelta(hours=1)
+        )
+        self.assertEqual(tasks.claim(10), [])
+
+    def test_claimed_task_not_claimed_twice(self):
+        tasks.enqueue(record, ['once'])
+        self.assertEqual(len(tasks.claim(10)), 1)
+        self.assertEqual(tasks.claim(10), [])
+
+    def test_retries_with_backoff(self):
+        """Упавшая задача откладывается с ростом паузы, затем помечается"""
+        with self.settings(TASK_MAX_ATTEMPTS=2, TASK_RETRY_DELAY=10):
+            tasks.enqueue(explode)
+        [pk] = tasks.claim(10)
+        before = timezone.now()
+        with self.settings(TASK_RETRY_DELAY=10), self.assertLogs(
+            'core.tasks', 'ERROR'
+        ):
+            self.assertFalse(tasks.run(pk))
+        item = Task.objects.get(pk=pk)
+        self.assertEqual(item.status, Task.PENDING)
+        self.assertEqual(item.attempts, 1)
+        self.assertGreaterEqual(item.run_at, before + timedelta(seconds=10))
+        self.assertIn('Ошибка задачи', item.last_error)
+        Task.objects.filter(pk=pk).update(run_at=timezone.now())
+        tasks.claim(10)
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.assertFalse(tasks.run(pk))
+        self.assertEqual(Task.objects.get(pk=pk).status, Task.FAILED)
+        self.assertEqual(tasks.claim(10), [])
+
+    def test_only_marked_functions_run(self):
+        Task.objects.create(
+            name=f'{__name__}.not_a_task', payload='[[], {}]', max_attempts=1
+        )
+        [pk] = tasks.claim(10)
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.assertFalse(tasks.run(pk))
+        self.assertEqual(Task.objects.get(pk=pk).status, Task.FAILED)
+
+    def test_eager_mode(self):
+        with self.settings(TASKS_EAGER=True):
+            tasks.enqueue(record, ['now'])
+        self.assertEqual(CALLS, ['now'])
+        self.assertFalse(Task.objects.exists())
+
+
+class RunWorkerTest(TransactionTestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_worker_runs_ready_tasks(self):
+        for value in range(5):
+            tasks.enqueue(record, [value])
+        tasks.enqueue(explode)
+        out = StringIO()
+        # Один поток: общая in-memory база тестов SQLite не ждёт
+        # блокировок таблиц, как файловая.
+        with self.assertLogs('core.tasks', 'ERROR'):
+            call_command('run_worker', workers=1, once=True, stdout=out)
+        self.assertEqual(sorted(CALLS), list(range(5)))
+        self.assertIn('Выполнено задач: 6, с ошибкой: 1', out.getvalue())
+        self.assertEqual(Task.objects.get().name, explode.task_name)
+
+    def test_password_reset_mail_sent_by_worker(self):
+        User.objects.create_user('user', 'user@example.com', 'password')
+        self.client.post(
+            reverse('users:password_reset'), {'email': 'user@example.com'}
+        )
+        self.assertEqual(len(mail.outbox), 0)
+        call_command('run_worker', workers=1, once=True, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['user@example.com'])
@@ -0,0 +1,58 @@
+import os
+import shutil
+import stat
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.storage import UMASK, ContentAddressedStorage
+from core.views import media
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_identical_content_saved_once(self):
+        storage = ContentAddressedStorage()
+        first = storage.save('posts/a.gif', ContentFile(b'content'))
+        second = storage.save('posts/b.GIF', ContentFile(b'content'))
+        other = storage.save('posts/a.gif', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertTrue(first.startswith('posts/') and first.endswith('.gif'))
+        self.assertEqual(
+            os.listdir(os.path.dirname(storage.path(first))),
+            [os.path.basename(first)]
+        )
+
+    def test_saved_file_permissions(self):
+        """Права файла как у FileSystemStorage, а не 0600 от mkstemp"""
+        storage = ContentAddressedStorage()
+        name = storage.save('posts/a.gif', ContentFile(b'permissions'))
+        self.assertEqual(
+            stat.S_IMODE(os.stat(storage.path(name)).st_mode),
+            0o666 & ~UMASK
+        )
+        with self.settings(FILE_UPLOAD_PERMISSIONS=0o640):
+            storage = ContentAddressedStorage()
+            name = storage.save('posts/a.gif', ContentFile(b'mode'))
+        self.assertEqual(
+            stat.S_IMODE(os.stat(storage.path(name)).st_mode), 0o640
+        )
+
+    def test_media_served_immutable(self):
+        name = ContentAddressedStorage().save(
+            'posts/a.gif', ContentFile(b'content')
+        )
+        response = media(RequestFactory().get('/media/' + name), name)
+        self.assertEqual(
+            response['Cache-Control'], settings.MEDIA_CACHE_CONTROL
+        )
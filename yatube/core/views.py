@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.shortcuts import render
+from django.views.static import serve
 from http import HTTPStatus
 
 
@@ -28,3 +30,14 @@ def server_error(request):
         'core/500.html',
         status=HTTPStatus.INTERNAL_SERVER_ERROR
     )
+
+
+def media(request, path):
+    """Отдаёт медиафайлы при DEBUG с вечным кэшированием.
+
+    Имена файлов зависят от содержимого (ContentAddressedStorage, sorl),
+    поэтому файл по одному URL никогда не меняется.
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    response['Cache-Control'] = settings.MEDIA_CACHE_CONTROL
+    return response
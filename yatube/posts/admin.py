@@ -1,10 +1,21 @@
 from django.contrib import admin
+from django.db.models import Q
 
+from core.paginators import EstimatedCountPaginator
+
+from . import search
 from .models import Comment, Follow, Group, Post
 
 
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список без полного COUNT(*) и без LIKE по всей таблице."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
+
+
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(LargeTableAdmin):
     list_display = (
         'pk',
         'text',
@@ -12,10 +23,14 @@ class PostAdmin(admin.ModelAdmin):
         'author',
         'group',
     )
-    list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
-    empty_value_display = '-пусто-'
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу FTS5 (posts.search) вместо LIKE '%...%'.
+        return search.matching(queryset, search_term), False
 
 
 @admin.register(Group)
@@ -31,20 +46,41 @@ class GroupAdmin(admin.ModelAdmin):
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = (
         'pk',
         'text',
         'author',
+        'post',
+        'created',
     )
-    search_fields = ('text', 'author',)
-    list_filter = ('author',)
-    empty_value_display = '-пусто-'
+    list_select_related = ('author', 'post')
+    autocomplete_fields = ('author', 'post')
+    search_fields = ('author__username',)
+    list_filter = ('created',)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Точное имя автора или номер поста: оба ищутся по индексу.
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        condition = Q(author__username=term)
+        if term.isdigit():
+            condition |= Q(post_id=int(term))
+        return queryset.filter(condition), False
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
-    llist_display = ('author', 'user',)
-    search_fields = ('author',)
-    list_filter = ('author', 'user',)
-    empty_value_display = '-пусто-'
+class FollowAdmin(LargeTableAdmin):
+    list_display = ('pk', 'user', 'author',)
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    search_fields = ('user__username', 'author__username',)
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        return queryset.filter(
+            Q(user__username=term) | Q(author__username=term)
+        ), False
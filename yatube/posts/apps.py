@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from . import signals
+
+        # После миграций и flush (в т.ч. в тестах) закэшированные
+        # фрагменты могут не соответствовать содержимому БД.
+        post_migrate.connect(signals.bump_generation, sender=self)
+        post_migrate.connect(signals.repair_search_index, sender=self)
@@ -0,0 +1,88 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, Profile, User
+
+
+def count_of(model, field, outer='pk'):
+    """Подзапрос: число строк model, ссылающихся на внешнюю запись."""
+    rows = model.objects.filter(**{field: OuterRef(outer)}).order_by()
+    return Coalesce(
+        Subquery(rows.values(field).annotate(n=Count('*')).values('n')), 0
+    )
+
+
+def recount(user_id):
+    profile, _ = Profile.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': Post.objects.filter(author_id=user_id).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=user_id
+            ).count(),
+            'following_count': Follow.objects.filter(
+                user_id=user_id
+            ).count(),
+        },
+    )
+    return profile
+
+
+def shifted(field, delta):
+    """F(field) + delta; уменьшение не опускается ниже нуля, чтобы
+    расхождение со строками (bulk_create, loaddata) не ломало удаление."""
+    if delta < 0:
+        return Greatest(F(field) + delta, 0)
+    return F(field) + delta
+
+
+def bump(user_id, **deltas):
+    updated = Profile.objects.filter(user_id=user_id).update(**{
+        field: shifted(field, delta) for field, delta in deltas.items()
+    })
+    if not updated and min(deltas.values()) > 0:
+        recount(user_id)
+
+
+def profile_of(user):
+    """Счётчики пользователя; профиль создаётся вместе с пользователем,
+    пересчёт нужен лишь для записей, добавленных в обход сигналов."""
+    try:
+        return user.profile
+    except Profile.DoesNotExist:
+        return recount(user.pk)
+
+
+def bump_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=shifted('comments_count', delta)
+    )
+
+
+def reconcile():
+    """Пересчитывает все счётчики, возвращает число исправленных строк."""
+    Profile.objects.bulk_create(
+        [Profile(user_id=pk) for pk in User.objects.filter(
+            profile__isnull=True
+        ).values_list('pk', flat=True)],
+        ignore_conflicts=True,
+    )
+    profiles = {
+        'posts_count': count_of(Post, 'author', 'user'),
+        'followers_count': count_of(Follow, 'author', 'user'),
+        'following_count': count_of(Follow, 'user', 'user'),
+    }
+    posts = {'comments_count': count_of(Comment, 'post')}
+    drifted = 0
+    for queryset, expected in (
+        (Profile.objects.all(), profiles),
+        (Post.objects.all(), posts),
+    ):
+        stale = Q()
+        for field in expected:
+            stale |= ~Q(**{field: F(f'expected_{field}')})
+        drifted += queryset.annotate(**{
+            f'expected_{field}': value for field, value in expected.items()
+        }).filter(stale).count()
+        queryset.update(**expected)
+    return drifted
@@ -0,0 +1,104 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Follow, Group, Post
+from .utils import COMPACT_JSON
+
+# Столбцы выгрузки и пути к ним в ORM; первым идёт первичный ключ.
+# Формат совпадает с тем, что принимает import_content.
+EXPORTS = {
+    'group': (Group, {
+        'id': 'id',
+        'title': 'title',
+        'slug': 'slug',
+        'description': 'description',
+        'updated': 'updated',
+    }),
+    'post': (Post, {
+        'id': 'id',
+        'text': 'text',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'image': 'image',
+        'pub_date': 'pub_date',
+        'updated': 'updated',
+    }),
+    'comment': (Comment, {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+        'updated': 'updated',
+    }),
+    'follow': (Follow, {
+        'id': 'id',
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+}
+
+
+def parse_since(value):
+    """Момент начала инкрементальной выгрузки из строки ISO 8601."""
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(f'Некорректная дата: {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def rows(kind, since=None, after_id=None, chunk_size=1000):
+    """Строки таблицы kind по возрастанию id, пачками по chunk_size.
+
+    Каждая пачка — отдельный запрос по ключу (id > последнего), поэтому
+    память не зависит от размера таблицы. since отбирает записи,
+    изменённые не раньше этого момента; у подписок нет даты изменения,
+    для них действует только after_id.
+    """
+    model, columns = EXPORTS[kind]
+    queryset = model.objects.order_by('pk')
+    if since is not None and 'updated' in columns:
+        queryset = queryset.filter(updated__gte=since)
+    last_pk = after_id or 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk).values_list(
+            *columns.values()
+        )[:chunk_size])
+        if not chunk:
+            return
+        for row in chunk:
+            yield dict(zip(columns, row))
+        last_pk = chunk[-1][0]
+
+
+def ndjson(kinds, **options):
+    """Строки NDJSON с полем type для каждой записи таблиц kinds."""
+    for kind in kinds:
+        for row in rows(kind, **options):
+            yield json.dumps(
+                {'type': kind, **row}, cls=DjangoJSONEncoder, **COMPACT_JSON
+            ) + '\n'
+
+
+class Echo:
+    """Файл для csv.writer, который возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(kind, **options):
+    """Заголовок и строки CSV таблицы kind."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORTS[kind][1])
+    for row in rows(kind, **options):
+        yield writer.writerow([
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in row.values()
+        ])
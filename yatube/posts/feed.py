@@ -0,0 +1,55 @@
+import heapq
+from itertools import islice
+
+from core.paginators import CursorPaginator
+
+from . import timeline
+from .models import Post, Timeline
+
+
+def _unique(posts):
+    last = None
+    for post in posts:
+        if post.pk != last:
+            last = post.pk
+            yield post
+
+
+class FollowFeed(CursorPaginator):
+    """Лента подписок: разложенные при публикации записи Timeline
+    сливаются (k-way merge по pub_date, id) с постами популярных авторов,
+    которые подтягиваются при чтении.
+    """
+
+    def __init__(self, user, per_page):
+        super().__init__(Post.objects.all(), per_page)
+        self.user = user
+
+    def sources(self):
+        pushed = Timeline.objects.filter(user=self.user).select_related(
+            'post__author', 'post__group'
+        )
+        yield (
+            CursorPaginator(pushed, self.per_page, ('-pub_date', '-post_id')),
+            lambda entry: entry.post,
+        )
+        # Все подтягиваемые авторы читаются одним запросом по тому же
+        # ключу (pub_date, id).
+        pulled = list(timeline.pulled_authors(self.user.pk))
+        if pulled:
+            posts = Post.objects.filter(
+                author_id__in=pulled
+            ).select_related('author', 'group')
+            yield CursorPaginator(posts, self.per_page), None
+
+    def fetch(self, values, backwards, limit):
+        streams = []
+        for source, to_post in self.sources():
+            rows = source.fetch(values, backwards, limit)
+            streams.append(map(to_post, rows) if to_post else rows)
+        merged = heapq.merge(
+            *streams,
+            key=lambda post: (post.pub_date, post.pk),
+            reverse=not backwards,
+        )
+        return list(islice(_unique(merged), limit))
@@ -0,0 +1,97 @@
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import transaction
+from django.db.models import F
+from PIL import Image, ImageOps
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+from .models import Post, StoredImage
+
+logger = logging.getLogger(__name__)
+
+# Метаданные, которые не сохраняются в перекодированном файле.
+STRIPPED_INFO = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment')
+
+
+def ingest(upload):
+    """Проверяет загруженное изображение и при необходимости уменьшает его.
+
+    Размеры читаются из заголовка до декодирования пикселей, поэтому
+    «бомбы» отклоняются без выделения памяти. Снимки с EXIF или с
+    длинной стороной больше settings.POST_IMAGE_MAX_EDGE перекодируются
+    во временный файл без метаданных, остальные возвращаются как есть.
+    """
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except Image.DecompressionBombError:
+        raise ValidationError('Слишком большое изображение.')
+    with image:
+        width, height = image.size
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                f'Слишком большое изображение: {width}×{height} пикселей.'
+            )
+        max_edge = settings.POST_IMAGE_MAX_EDGE
+        oversized = max(width, height) > max_edge
+        if getattr(image, 'is_animated', False) or not (
+            oversized or image.getexif()
+        ):
+            upload.seek(0)
+            return upload
+        image_format = image.format if image.format in Image.SAVE else 'JPEG'
+        # JPEG декодируется сразу в уменьшенном масштабе.
+        image.draft(None, (max_edge, max_edge))
+        result = ImageOps.exif_transpose(image)
+    result.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    for key in STRIPPED_INFO:
+        result.info.pop(key, None)
+    if image_format == 'JPEG' and result.mode not in ('RGB', 'L', 'CMYK'):
+        result = result.convert('RGB')
+    output = TemporaryUploadedFile(
+        upload.name, upload.content_type, 0, None
+    )
+    result.save(output, format=image_format, quality=90, optimize=True)
+    output.size = output.tell()
+    output.seek(0)
+    return output
+
+
+def acquire(name):
+    """Ещё один пост ссылается на файл name."""
+    if not name:
+        return
+    stored, created = StoredImage.objects.get_or_create(
+        name=name, defaults={'references': 1}
+    )
+    if not created:
+        StoredImage.objects.filter(name=name).update(
+            references=F('references') + 1
+        )
+
+
+def release(name):
+    """Пост больше не ссылается на name; последний удаляет файл."""
+    if not name:
+        return
+    StoredImage.objects.filter(name=name, references__gt=0).update(
+        references=F('references') - 1
+    )
+    deleted, _ = StoredImage.objects.filter(name=name, references=0).delete()
+    if deleted:
+        transaction.on_commit(lambda: _delete_file(name))
+
+
+def _delete_file(name):
+    if StoredImage.objects.filter(name=name).exists():
+        return
+    storage = Post._meta.get_field('image').storage
+    # Вместе с исходником удаляются миниатюры и записи sorl о них.
+    try:
+        delete(ImageFile(name, storage))
+    except Exception:
+        logger.exception('Не удалось удалить файл %s', name)
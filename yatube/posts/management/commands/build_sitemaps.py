@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import sitemaps
+
+
+class Command(BaseCommand):
+    help = (
+        'Собирает карту сайта: индекс и файлы постов, сообществ и профилей '
+        'по 50 000 адресов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url', default=settings.SITE_URL,
+            help='Адрес сайта для ссылок; по умолчанию settings.SITE_URL',
+        )
+        parser.add_argument(
+            '--output', default=settings.SITEMAP_ROOT,
+            help='Каталог для файлов; по умолчанию settings.SITEMAP_ROOT',
+        )
+        parser.add_argument(
+            '--chunk', type=int, default=sitemaps.CHUNK_SIZE,
+            help='Сколько адресов в одном файле',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        total = sitemaps.build(
+            options['output'], options['base_url'], options['chunk']
+        )
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'В карту сайта записано адресов: {total} за {elapsed:.1f} с'
+        ))
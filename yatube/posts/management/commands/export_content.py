@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает сообщества, посты, комментарии и подписки в NDJSON '
+        'или CSV, не загружая таблицы в память'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'kinds', nargs='*',
+            help=f'Какие таблицы выгружать: {", ".join(export.EXPORTS)}; '
+                 'по умолчанию все',
+        )
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'), default='ndjson',
+            help='CSV выгружает ровно одну таблицу',
+        )
+        parser.add_argument(
+            '-o', '--output',
+            help='Файл для выгрузки; по умолчанию stdout',
+        )
+        parser.add_argument(
+            '--since', type=export.parse_since,
+            help='Только записи, изменённые начиная с этого момента '
+                 '(ISO 8601)',
+        )
+        parser.add_argument(
+            '--after-id', type=int,
+            help='Только записи с id больше заданного',
+        )
+        parser.add_argument(
+            '--chunk', type=int, default=1000,
+            help='Сколько строк читать одним запросом',
+        )
+
+    def handle(self, *args, **options):
+        kinds = options['kinds'] or tuple(export.EXPORTS)
+        unknown = set(kinds) - set(export.EXPORTS)
+        if unknown:
+            raise CommandError(f'Неизвестные таблицы: {", ".join(unknown)}')
+        params = {
+            'since': options['since'],
+            'after_id': options['after_id'],
+            'chunk_size': options['chunk'],
+        }
+        if options['format'] == 'csv':
+            if len(kinds) != 1:
+                raise CommandError('CSV выгружает ровно одну таблицу')
+            lines = export.csv_lines(kinds[0], **params)
+        else:
+            lines = export.ndjson(kinds, **params)
+        if options['output'] is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(
+            options['output'], 'w', newline='', encoding='utf-8'
+        ) as file:
+            file.writelines(lines)
@@ -0,0 +1,372 @@
+import csv
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core import generation
+from posts import counters, search, timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+# Порядок сохранения в пачке: сообщества и посты раньше ссылок на них.
+TYPES = ('group', 'post', 'comment', 'follow')
+
+# Старые сборки SQLite ограничивают число параметров запроса 999.
+CHUNK = 500
+
+
+def chunks(values, size=CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def read_records(file, file_format):
+    """Построчно отдаёт (номер строки, запись); None — нечитаемая строка."""
+    if file_format == 'csv':
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield number, record if isinstance(record, dict) else None
+
+
+def reserve_ids(model, count):
+    """Резервирует count идущих подряд id таблицы model в SQLite.
+
+    Сдвигается счётчик AUTOINCREMENT (sqlite_sequence), поэтому id
+    удалённых записей, как и при обычной вставке, повторно не выдаются,
+    а параллельные вставки до фиксации транзакции ждут блокировку записи.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'UPDATE sqlite_sequence SET seq = seq + %s WHERE name = %s',
+            [count, table],
+        )
+        if not cursor.rowcount:
+            # В таблицу ещё ни разу не вставляли строк.
+            cursor.execute(
+                'INSERT INTO sqlite_sequence (name, seq) '
+                f'SELECT %s, COALESCE(MAX(id), 0) + %s FROM {table}',
+                [table, count],
+            )
+        cursor.execute(
+            'SELECT seq FROM sqlite_sequence WHERE name = %s', [table]
+        )
+        last, = cursor.fetchone()
+    return range(last - count + 1, last + 1)
+
+
+@contextmanager
+def explicit_dates():
+    """Даты публикации и комментариев берутся из файла, а не now()."""
+    fields = (
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    )
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает сообщества, посты, комментарии и подписки из NDJSON '
+        'или CSV (в том числе выгрузку export_content). Авторы и '
+        'подписчики задаются username, сообщество — slug, пост '
+        'комментария — id поста из того же импорта'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='+',
+            help='Файлы для загрузки по порядку; - читает stdin',
+        )
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'),
+            help='Формат файлов; по умолчанию по расширению',
+        )
+        parser.add_argument(
+            '--type', choices=TYPES,
+            help='Тип записей без поля type (обязателен для CSV)',
+        )
+        parser.add_argument(
+            '--batch', type=int, default=1000,
+            help='Сколько записей сохранять в одной транзакции',
+        )
+        parser.add_argument(
+            '--create-missing', action='store_true',
+            help='Создавать неизвестных пользователей (без пароля) '
+                 'и сообщества',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch'] < 1:
+            raise CommandError('--batch должен быть положительным')
+        self.batch_size = options['batch']
+        self.create_missing = options['create_missing']
+        self.users = {}
+        self.groups = {}
+        self.posts = {}
+        self.pending = []
+        self.imported = dict.fromkeys(TYPES, 0)
+        self.skipped = 0
+        self.authors = set()
+        self.followers = set()
+        start = time.perf_counter()
+        # bulk_create не отправляет сигналы, а триггеры поиска
+        # отключаются: счётчики, ленты, индекс и поколение
+        # пересчитываются один раз в конце.
+        search.drop_triggers()
+        try:
+            with explicit_dates():
+                for path in options['paths']:
+                    self.load(path, options['format'], options['type'])
+                self.flush()
+        finally:
+            if self.imported['post']:
+                search.rebuild()
+            else:
+                search.install()
+        self.rebuild_derived()
+        elapsed = time.perf_counter() - start
+        total = sum(self.imported.values())
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено сообществ: {self.imported["group"]}, '
+            f'постов: {self.imported["post"]}, '
+            f'комментариев: {self.imported["comment"]}, '
+            f'подписок: {self.imported["follow"]}; '
+            f'пропущено записей: {self.skipped} '
+            f'({elapsed:.1f} с, {rate:.0f} записей/с)'
+        ))
+
+    def load(self, path, file_format, default_type):
+        if file_format is None:
+            extension = os.path.splitext(path)[1].lower()
+            file_format = 'csv' if extension == '.csv' else 'ndjson'
+        if path == '-':
+            file = sys.stdin
+        else:
+            try:
+                file = open(path, newline='', encoding='utf-8')
+            except OSError as error:
+                raise CommandError(f'Не удалось открыть {path}: {error}')
+        try:
+            for number, record in read_records(file, file_format):
+                where = f'{path}:{number}'
+                if record is None:
+                    self.skip(where, 'некорректная запись')
+                    continue
+                kind = record.get('type') or default_type
+                if kind not in TYPES:
+                    self.skip(where, f'неизвестный тип записи {kind!r}')
+                    continue
+                self.pending.append((where, kind, record))
+                if len(self.pending) >= self.batch_size:
+                    self.flush()
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+    def skip(self, where, message):
+        self.skipped += 1
+        self.stderr.write(f'{where}: {message}, запись пропущена')
+
+    def flush(self):
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        with transaction.atomic():
+            self.post_ids = None
+            if not connection.features.can_return_ids_from_bulk_insert:
+                # SQLite не возвращает id из bulk_create, поэтому id
+                # постов резервируются заранее. Резерв — первая команда
+                # транзакции: она сразу берёт блокировку записи, а не
+                # получает «database is locked», переходя от чтения к
+                # записи. Пропущенные записи оставляют пропуски в id.
+                self.post_ids = iter(reserve_ids(Post, sum(
+                    kind == 'post' for _, kind, _ in pending
+                )))
+            self.resolve(User, 'username', self.users, (
+                record.get(field) for _, kind, record in pending
+                for field in ('author', 'user')
+            ))
+            for kind in TYPES:
+                rows = [
+                    (where, record) for where, record_kind, record in pending
+                    if record_kind == kind
+                ]
+                if rows:
+                    getattr(self, f'create_{kind}s')(rows)
+
+    def resolve(self, model, field, known, keys):
+        """Дополняет карту known значениями field -> pk для keys."""
+        missing = {key for key in keys if key and key not in known}
+        for chunk in chunks(missing):
+            known.update(model.objects.filter(
+                **{f'{field}__in': chunk}
+            ).values_list(field, 'pk'))
+        missing -= known.keys()
+        if not missing or not self.create_missing:
+            return
+        if model is User:
+            objects = [
+                User(username=key, password=make_password(None))
+                for key in missing
+            ]
+        else:
+            objects = [Group(slug=key, title=key) for key in missing]
+        model.objects.bulk_create(objects, ignore_conflicts=True)
+        for chunk in chunks(missing):
+            known.update(model.objects.filter(
+                **{f'{field}__in': chunk}
+            ).values_list(field, 'pk'))
+
+    def parse_date(self, record, field):
+        value = record.get(field)
+        if not value:
+            return timezone.now()
+        date = parse_datetime(value)
+        if date is None:
+            raise ValueError(f'некорректная дата {value!r}')
+        if timezone.is_naive(date):
+            date = timezone.make_aware(date)
+        return date
+
+    def user(self, record, field):
+        username = record.get(field)
+        if username not in self.users:
+            raise ValueError(f'неизвестный пользователь {username!r}')
+        return self.users[username]
+
+    def create_groups(self, rows):
+        """Создаёт сообщества с новыми slug; существующие не меняются."""
+        groups = {}
+        for where, record in rows:
+            slug = record.get('slug')
+            if not slug or not record.get('title'):
+                self.skip(where, 'нет slug или заголовка')
+                continue
+            groups[slug] = Group(
+                slug=slug,
+                title=record['title'],
+                description=record.get('description') or None,
+            )
+        existing = set()
+        for chunk in chunks(groups):
+            existing.update(Group.objects.filter(
+                slug__in=chunk
+            ).values_list('slug', flat=True))
+        created = [
+            group for slug, group in groups.items() if slug not in existing
+        ]
+        Group.objects.bulk_create(created, ignore_conflicts=True)
+        self.imported['group'] += len(created)
+
+    def create_posts(self, rows):
+        self.resolve(Group, 'slug', self.groups, (
+            record.get('group') for _, record in rows
+        ))
+        posts = []
+        legacy_ids = []
+        for where, record in rows:
+            try:
+                group = record.get('group')
+                if group and group not in self.groups:
+                    raise ValueError(f'неизвестное сообщество {group!r}')
+                if not record.get('text'):
+                    raise ValueError('пустой текст')
+                post = Post(
+                    text=record['text'],
+                    author_id=self.user(record, 'author'),
+                    group_id=self.groups.get(group),
+                    pub_date=self.parse_date(record, 'pub_date'),
+                )
+            except ValueError as error:
+                self.skip(where, error)
+                continue
+            posts.append(post)
+            legacy_ids.append(record.get('id'))
+        if self.post_ids is not None:
+            for post in posts:
+                post.pk = next(self.post_ids)
+        Post.objects.bulk_create(posts)
+        for legacy_id, post in zip(legacy_ids, posts):
+            if legacy_id not in (None, ''):
+                self.posts[str(legacy_id)] = post.pk
+            self.authors.add(post.author_id)
+        self.imported['post'] += len(posts)
+
+    def create_comments(self, rows):
+        comments = []
+        for where, record in rows:
+            try:
+                legacy_id = record.get('post')
+                post_id = self.posts.get(str(legacy_id))
+                if post_id is None:
+                    raise ValueError(f'неизвестный пост {legacy_id!r}')
+                if not record.get('text'):
+                    raise ValueError('пустой текст')
+                comments.append(Comment(
+                    post_id=post_id,
+                    author_id=self.user(record, 'author'),
+                    text=record['text'],
+                    created=self.parse_date(record, 'created'),
+                ))
+            except ValueError as error:
+                self.skip(where, error)
+        Comment.objects.bulk_create(comments)
+        self.imported['comment'] += len(comments)
+
+    def create_follows(self, rows):
+        follows = []
+        for where, record in rows:
+            try:
+                follow = Follow(
+                    user_id=self.user(record, 'user'),
+                    author_id=self.user(record, 'author'),
+                )
+                if follow.user_id == follow.author_id:
+                    raise ValueError('подписка на самого себя')
+            except ValueError as error:
+                self.skip(where, error)
+                continue
+            follows.append(follow)
+            self.followers.add(follow.user_id)
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        self.imported['follow'] += len(follows)
+
+    def rebuild_derived(self):
+        if not any(self.imported.values()):
+            return
+        with transaction.atomic():
+            counters.reconcile()
+        readers = set(self.followers)
+        for chunk in chunks(self.authors):
+            readers.update(Follow.objects.filter(
+                author_id__in=chunk
+            ).values_list('user_id', flat=True))
+        for user_id in sorted(readers):
+            with transaction.atomic():
+                timeline.rebuild(user_id)
+        generation.bump()
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch', type=int, default=1000,
+            help='Сколько постов индексировать в одной транзакции',
+        )
+
+    def handle(self, *args, **options):
+        indexed = search.rebuild(options['batch'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {indexed}'
+        ))
@@ -0,0 +1,107 @@
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import generation
+from posts import thumbnails
+from posts.models import Post
+
+logger = logging.getLogger(__name__)
+
+
+def rebuild(name):
+    """Создаёт миниатюры одного файла; выполняется в дочернем процессе."""
+    try:
+        thumbnails.generate(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+        return False
+    return True
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт миниатюры из settings.POST_THUMBNAILS для всех '
+        'изображений постов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-w', '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов; 0 — без пула, в текущем процессе',
+        )
+        parser.add_argument(
+            '--batch', type=int, default=100,
+            help='Сколько изображений обрабатывать между сохранениями '
+                 'контрольной точки',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с id последнего обработанного поста для продолжения',
+        )
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Начать сначала, не читая контрольную точку',
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        last_pk = 0
+        if checkpoint and not options['reset'] and os.path.exists(checkpoint):
+            with open(checkpoint) as file:
+                last_pk = int(file.read().strip() or 0)
+            self.stdout.write(f'Продолжение после поста {last_pk}')
+        posts = Post.objects.exclude(image='').order_by('pk').values_list(
+            'pk', 'image'
+        )
+        pool = None
+        if options['workers']:
+            pool = ProcessPoolExecutor(options['workers'])
+        done = failed = 0
+        start = time.perf_counter()
+        try:
+            while True:
+                batch = list(posts.filter(pk__gt=last_pk)[:options['batch']])
+                if not batch:
+                    break
+                names = [name for pk, name in batch]
+                if pool is None:
+                    results = map(rebuild, names)
+                else:
+                    # Дочерние процессы не должны унаследовать открытые
+                    # соединения с БД.
+                    connections.close_all()
+                    results = pool.map(rebuild, names)
+                for result in results:
+                    done += 1
+                    failed += not result
+                last_pk = batch[-1][0]
+                if checkpoint:
+                    self.save_checkpoint(checkpoint, last_pk)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f'Обработано {done} изображений, '
+                    f'{done / elapsed:.1f} изобр./с'
+                )
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        if done:
+            generation.bump()
+        elapsed = time.perf_counter() - start
+        rate = done / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {done} изображений за {elapsed:.1f} с '
+            f'({rate:.1f} изобр./с), ошибок: {failed}'
+        ))
+
+    @staticmethod
+    def save_checkpoint(path, pk):
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as file:
+            file.write(str(pk))
+        os.replace(temporary, path)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+from posts.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок из таблицы Follow'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пересобрать ленты только этих пользователей',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(
+            pk__in=Follow.objects.values('user_id')
+        )
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+        rebuilt = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            with transaction.atomic():
+                timeline.rebuild(user_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f'Пересобрано лент: {rebuilt}'))
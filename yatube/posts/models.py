@@ -2,6 +2,8 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from django.db.models import CheckConstraint, F, UniqueConstraint, Q
 
+from core.storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -9,6 +11,7 @@ class Group(models.Model):
     title = models.CharField('Заголовок', max_length=200)
     slug = models.SlugField('Идентификатор', unique=True)
     description = models.TextField('Описание', blank=True, null=True)
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
 
     class Meta:
         verbose_name = 'Сообщество'
@@ -20,6 +23,7 @@ class Group(models.Model):
 class Post(models.Model):
     text = models.TextField('Текст публикации')
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -37,12 +41,26 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Публикация'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -73,9 +91,17 @@ class Comment(models.Model):
         verbose_name='Дата комментария',
         auto_now_add=True
     )
+    updated = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
 
     class Meta:
         ordering = ('-created',)
+        indexes = [
+            models.Index(fields=['post', '-created', '-id'],
+                         name='comment_post_created_idx'),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -107,3 +133,70 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class Timeline(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Публикация',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Лента подписок'
+        ordering = ('-pub_date',)
+        constraints = [
+            UniqueConstraint(fields=['user', 'post'],
+                             name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post} в ленте {self.user}'
+
+
+class Profile(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='profile',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики автора'
+        verbose_name_plural = 'Счётчики авторов'
+
+    def __str__(self):
+        return f'Счётчики {self.user}'
+
+
+class StoredImage(models.Model):
+    """Число постов, ссылающихся на файл в ContentAddressedStorage."""
+    name = models.CharField('Файл', max_length=255, primary_key=True)
+    references = models.PositiveIntegerField('Число ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл изображения'
+        verbose_name_plural = 'Файлы изображений'
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,179 @@
+import re
+
+from django.db import connection, models, transaction
+from django.db.models.expressions import RawSQL
+
+from core.paginators import CursorPaginator
+
+from .models import Post
+
+TABLE = 'posts_post_fts'
+
+# Индекс FTS5 хранит только токены, текст берётся из posts_post
+# (external content); триггеры поддерживают его при любых изменениях.
+SCHEMA = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    f'CREATE TRIGGER IF NOT EXISTS {TABLE}_insert AFTER INSERT ON posts_post '
+    f'BEGIN INSERT INTO {TABLE}(rowid, text) VALUES (new.id, new.text); END',
+    f'CREATE TRIGGER IF NOT EXISTS {TABLE}_delete AFTER DELETE ON posts_post '
+    f"BEGIN INSERT INTO {TABLE}({TABLE}, rowid, text) "
+    "VALUES ('delete', old.id, old.text); END",
+    f'CREATE TRIGGER IF NOT EXISTS {TABLE}_update '
+    'AFTER UPDATE OF text ON posts_post '
+    f"BEGIN INSERT INTO {TABLE}({TABLE}, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    f'INSERT INTO {TABLE}(rowid, text) VALUES (new.id, new.text); END',
+)
+
+TRIGGERS = tuple(
+    f'{TABLE}_{action}' for action in ('insert', 'delete', 'update')
+)
+
+RANK_FIELD = models.FloatField()
+RANK_FIELD.set_attributes_from_name('rank')
+
+
+def match_expression(query):
+    """Запрос пользователя в синтаксисе FTS5: все слова, последнее — префикс.
+
+    Слова берутся в кавычки, поэтому операторы FTS5 во вводе не работают
+    и не ломают запрос.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсор по (bm25, id): лучшие совпадения первыми, без OFFSET."""
+
+    def __init__(self, object_list, per_page, expression):
+        super().__init__(object_list, per_page, ('rank', 'id'))
+        self.expression = expression
+
+    def _field(self, name):
+        if name == 'rank':
+            return RANK_FIELD
+        return super()._field(name)
+
+    def fetch(self, values, backwards, limit):
+        compare, order = ('<', 'DESC') if backwards else ('>', 'ASC')
+        # rank — скрытый столбец FTS5, по умолчанию равный bm25():
+        # чем меньше, тем лучше совпадение.
+        sql = f'SELECT rowid, rank FROM {TABLE} WHERE {TABLE} MATCH %s'
+        params = [self.expression]
+        if values is not None:
+            sql += (
+                f' AND (rank {compare} %s '
+                f'OR (rank = %s AND rowid {compare} %s))'
+            )
+            params += [values[0], values[0], values[1]]
+        sql += f' ORDER BY rank {order}, rowid {order} LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            ranks = dict(cursor.fetchall())
+        posts = self.object_list.in_bulk(ranks)
+        found = []
+        for pk, rank in ranks.items():
+            if pk in posts:
+                posts[pk].rank = rank
+                found.append(posts[pk])
+        return found
+
+
+def matching(queryset, query):
+    """Посты queryset, найденные по query через индекс FTS5."""
+    expression = match_expression(query)
+    if expression is None:
+        return queryset
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', [expression]
+    ))
+
+
+def search(query, per_page, after=None, before=None):
+    """Страница постов, найденных по query, или None для пустого запроса."""
+    expression = match_expression(query)
+    if expression is None:
+        return None
+    paginator = SearchPaginator(
+        Post.objects.select_related('author', 'group'), per_page, expression
+    )
+    return paginator.get_page(after=after, before=before)
+
+
+def install():
+    """Создаёт таблицу индекса и триггеры, если их нет."""
+    with connection.cursor() as cursor:
+        for statement in SCHEMA:
+            cursor.execute(statement)
+
+
+def drop_triggers():
+    """Отключает обновление индекса триггерами на время массовой загрузки.
+
+    Вернуть триггеры — install(), догнать индекс — rebuild().
+    """
+    with connection.cursor() as cursor:
+        for trigger in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+
+
+def repair():
+    """Переиндексирует посты, если у индекса не хватает триггеров.
+
+    SQLite теряет триггеры, когда миграция пересоздаёт таблицу
+    posts_post; вызывается после каждого migrate. Возвращает True,
+    если индекс пришлось перестроить.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT name FROM sqlite_master WHERE name IN (%s, %s, %s, %s)',
+            [TABLE, *TRIGGERS],
+        )
+        found = {name for name, in cursor.fetchall()}
+    # Без таблицы индекса миграция 0018 не применена.
+    if TABLE not in found or found.issuperset(TRIGGERS):
+        return False
+    rebuild()
+    return True
+
+
+def rebuild(batch_size=1000):
+    """Переиндексирует все посты пачками; возвращает их число.
+
+    Таблица и триггеры создаются, если их нет.
+    """
+    install()
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('delete-all')")
+    last_pk = 0
+    indexed = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT MAX(id), COUNT(*) FROM (SELECT id FROM posts_post '
+                'WHERE id > %s ORDER BY id LIMIT %s)',
+                [last_pk, batch_size],
+            )
+            upto, count = cursor.fetchone()
+            if not count:
+                break
+            cursor.execute(
+                f'INSERT INTO {TABLE}(rowid, text) SELECT id, text '
+                'FROM posts_post WHERE id > %s AND id <= %s',
+                [last_pk, upto],
+            )
+        last_pk = upto
+        indexed += count
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+    return indexed
@@ -0,0 +1,107 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import generation
+
+from . import counters, images, search, timeline
+from .models import Comment, Follow, Group, Post, Profile, User
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Profile.objects.create(user_id=instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.bump(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.post_id:
+        counters.bump_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    if instance.post_id:
+        counters.bump_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump(instance.author_id, followers_count=1)
+        counters.bump(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.bump(instance.author_id, followers_count=-1)
+    counters.bump(instance.user_id, following_count=-1)
+    timeline.unfollowed(instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def push_to_timelines(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.schedule_push(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def purge_timeline(sender, instance, **kwargs):
+    timeline.purge(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_generation(sender, raw=False, **kwargs):
+    if not raw:
+        generation.bump()
+
+
+@receiver(pre_save, sender=Post)
+def remember_image(sender, instance, raw=False, **kwargs):
+    instance.previous_image = ''
+    if not raw and not instance._state.adding:
+        instance.previous_image = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('image', flat=True).first() or ''
+
+
+@receiver(post_save, sender=Post)
+def count_image_references(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, 'previous_image', '')
+    if not raw and instance.image.name != previous:
+        images.acquire(instance.image.name)
+        images.release(previous)
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    images.release(instance.image.name)
+
+
+def repair_search_index(sender, verbosity=1, **kwargs):
+    # Как обработчики post_migrate самого Django: сообщение только
+    # при verbosity >= 2.
+    if search.repair() and verbosity >= 2:
+        print('Индекс поиска перестроен: не хватало триггеров')
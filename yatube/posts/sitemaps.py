@@ -0,0 +1,119 @@
+import glob
+import os
+from xml.sax.saxutils import escape
+
+from django.db.models import Max
+from django.urls import reverse
+
+from .models import Group, Post, User
+
+# Ограничение протокола: не больше 50 000 адресов в одном файле.
+CHUNK_SIZE = 50000
+
+INDEX = 'sitemap.xml'
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def sections():
+    """Разделы карты: имя, строки (id, аргумент URL, lastmod), имя URL."""
+    return (
+        (
+            'posts',
+            Post.objects.values_list('pk', 'pk', 'updated'),
+            'posts:post_detail',
+        ),
+        (
+            'groups',
+            Group.objects.values_list('pk', 'slug', 'updated'),
+            'posts:group_list',
+        ),
+        (
+            'profiles',
+            User.objects.annotate(
+                lastmod=Max('posts__updated')
+            ).filter(lastmod__isnull=False).values_list(
+                'pk', 'username', 'lastmod'
+            ),
+            'posts:profile',
+        ),
+    )
+
+
+def chunk_name(section, number):
+    return f'sitemap-{section}-{number}.xml'
+
+
+def _lastmod(value):
+    return value.isoformat(timespec='seconds')
+
+
+def _write(path, lines):
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        file.writelines(lines)
+    os.replace(temporary, path)
+
+
+def _urlset(base_url, url_name, rows):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield f'<urlset xmlns="{XMLNS}">\n'
+    for pk, argument, lastmod in rows:
+        location = escape(base_url + reverse(url_name, args=[argument]))
+        yield (
+            f'<url><loc>{location}</loc>'
+            f'<lastmod>{_lastmod(lastmod)}</lastmod></url>\n'
+        )
+    yield '</urlset>\n'
+
+
+def _index(base_url, chunks):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield f'<sitemapindex xmlns="{XMLNS}">\n'
+    for section, number, lastmod in chunks:
+        location = escape(base_url + reverse(
+            'posts:sitemap_section', args=[section, number]
+        ))
+        yield (
+            f'<sitemap><loc>{location}</loc>'
+            f'<lastmod>{_lastmod(lastmod)}</lastmod></sitemap>\n'
+        )
+    yield '</sitemapindex>\n'
+
+
+def build(directory, base_url, chunk_size=CHUNK_SIZE):
+    """Записывает в directory индекс и файлы разделов; возвращает
+    число адресов.
+
+    Каждый раздел обходится по возрастанию id: файл — это диапазон id
+    из chunk_size строк, выбранный одним запросом без OFFSET и COUNT.
+    Файлы заменяются атомарно, лишние от прошлой сборки удаляются.
+    """
+    base_url = base_url.rstrip('/')
+    os.makedirs(directory, exist_ok=True)
+    chunks = []
+    total = 0
+    for section, rows, url_name in sections():
+        last_pk = 0
+        number = 0
+        while True:
+            chunk = list(
+                rows.filter(pk__gt=last_pk).order_by('pk')[:chunk_size]
+            )
+            if not chunk:
+                break
+            number += 1
+            name = chunk_name(section, number)
+            _write(
+                os.path.join(directory, name),
+                _urlset(base_url, url_name, chunk),
+            )
+            chunks.append((section, number, max(row[2] for row in chunk)))
+            total += len(chunk)
+            last_pk = chunk[-1][0]
+        built = {chunk_name(section, n) for n in range(1, number + 1)}
+        pattern = os.path.join(directory, chunk_name(section, '*'))
+        for path in glob.glob(pattern):
+            if os.path.basename(path) not in built:
+                os.remove(path)
+    _write(os.path.join(directory, INDEX), _index(base_url, chunks))
+    return total
@@ -0,0 +1,100 @@
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+
+from .models import Group, Post, User
+
+
+class LatestPostsFeed(Feed):
+    """Последние посты сайта; тела лент кэширует
+    AnonymousPageCacheMiddleware (settings.PAGE_CACHE_VIEWS)."""
+    title = 'Yatube: последние обновления на сайте'
+    description = 'Новые записи всех авторов'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def items(self):
+        return Post.objects.select_related('author', 'group').order_by(
+            '-pub_date', '-id'
+        )[:settings.SYNDICATION_ITEMS]
+
+    def item_title(self, item):
+        return str(item)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=[item.pk])
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_updateddate(self, item):
+        return item.updated
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group else []
+
+
+class GroupPostsFeed(LatestPostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def description(self, group):
+        return group.description or f'Записи сообщества {group.title}'
+
+    def link(self, group):
+        return reverse('posts:group_list', args=[group.slug])
+
+    def items(self, group):
+        return group.group.select_related('author', 'group').order_by(
+            '-pub_date', '-id'
+        )[:settings.SYNDICATION_ITEMS]
+
+
+class AuthorPostsFeed(LatestPostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def description(self, author):
+        return f'Записи пользователя {author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=[author.username])
+
+    def items(self, author):
+        return author.posts.select_related('author', 'group').order_by(
+            '-pub_date', '-id'
+        )[:settings.SYNDICATION_ITEMS]
+
+
+class LatestPostsAtomFeed(LatestPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestPostsFeed.description
+
+
+class GroupPostsAtomFeed(GroupPostsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, group):
+        return self.description(group)
+
+
+class AuthorPostsAtomFeed(AuthorPostsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, author):
+        return self.description(author)
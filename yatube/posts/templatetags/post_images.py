@@ -0,0 +1,47 @@
+from django import template
+from django.conf import settings
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts, name='card'):
+    """Одним обращением к кэшу загружает миниатюры всех постов страницы."""
+    thumbnails.prefetch([post.image for post in posts], name)
+    return ''
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def responsive_image(image, name='card'):
+    """<picture> с вариантами миниатюры по ширине и формату.
+
+    Пока варианты не созданы фоновой задачей, выводит заглушку.
+    """
+    geometry = settings.POST_THUMBNAILS[name][0]
+    width, height = geometry.split('x')
+    context = {
+        'image': image,
+        'width': width,
+        'height': height,
+        'sizes': settings.POST_IMAGE_SIZES,
+    }
+    found = thumbnails.ready(image, name) if image else None
+    if not found:
+        return context
+    srcsets = {}
+    for variant, thumbnail in found:
+        srcsets.setdefault(variant.format, []).append(
+            f'{thumbnail.url} {variant.width}w'
+        )
+        if variant.width == int(width):
+            context['src'] = thumbnail.url
+    *sources, fallback = srcsets.items()
+    context['sources'] = [
+        {'type': f'image/{image_format.lower()}', 'srcset': ', '.join(urls)}
+        for image_format, urls in sources
+    ]
+    context['srcset'] = ', '.join(fallback[1])
+    context.setdefault('src', found[-1][1].url)
+    return context
@@ -0,0 +1,58 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class AdminTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.cat = Post.objects.create(
+            text='Кот на окне', author=cls.author, group=cls.group
+        )
+        cls.dog = Post.objects.create(text='Собака', author=cls.author)
+        Comment.objects.create(post=cls.cat, author=cls.admin, text='Мяу')
+        Follow.objects.create(user=cls.admin, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def changelist(self, model, **params):
+        url = reverse(f'admin:posts_{model}_changelist')
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def test_changelists_do_not_grow_with_rows(self):
+        """Число запросов списков не зависит от числа строк"""
+        for model in ('post', 'comment', 'follow'):
+            with self.subTest(model=model):
+                with self.assertNumQueries(4):
+                    self.changelist(model)
+
+    def test_post_search_uses_index(self):
+        """Поиск постов в админке идёт по индексу FTS5"""
+        cl = self.changelist('post', q='окн')
+        self.assertEqual(list(cl.result_list), [self.cat])
+
+    def test_search_by_username(self):
+        cl = self.changelist('comment', q='admin')
+        self.assertEqual(cl.result_count, 1)
+        cl = self.changelist('follow', q='author')
+        self.assertEqual(cl.result_count, 1)
+        cl = self.changelist('follow', q='auth')
+        self.assertEqual(cl.result_count, 0)
+
+    def test_estimated_count(self):
+        """Без фильтров число строк оценивается по наибольшему id"""
+        Post.objects.filter(pk=self.cat.pk).delete()
+        cl = self.changelist('post')
+        self.assertEqual(cl.result_count, self.dog.pk)
+        self.assertEqual(list(cl.result_list), [self.dog])
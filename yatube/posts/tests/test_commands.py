@@ -0,0 +1,354 @@
+import json
+import os
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import counters, search, thumbnails
+from ..models import Comment, Follow, Group, Post, Profile, Timeline, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class RebuildThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.post = Post.objects.create(
+            text='test_text',
+            author=cls.author,
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_rebuild_thumbnails_command(self):
+        """Команда создаёт миниатюры и запоминает контрольную точку"""
+        checkpoint = os.path.join(TEMP_MEDIA_ROOT, 'thumbnails.checkpoint')
+        out = StringIO()
+        call_command(
+            'rebuild_thumbnails', workers=0, checkpoint=checkpoint, stdout=out
+        )
+        self.assertIn('ошибок: 0', out.getvalue())
+        self.assertIsNotNone(thumbnails.ready(self.post.image, 'card'))
+        with open(checkpoint) as file:
+            self.assertEqual(int(file.read()), self.post.pk)
+        out = StringIO()
+        call_command(
+            'rebuild_thumbnails', workers=0, checkpoint=checkpoint, stdout=out
+        )
+        self.assertIn('Готово: 0 изображений', out.getvalue())
+
+
+class SearchIndexTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        Post.objects.create(text='Кот спит на окне', author=cls.author)
+        Post.objects.create(
+            text='Собака гонит кота, кот убегает', author=cls.author
+        )
+        Post.objects.create(text='Про птиц', author=cls.author)
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_index_repaired_after_migrate(self):
+        """migrate возвращает потерянные триггеры и догоняет индекс"""
+        search.drop_triggers()
+        fox = Post.objects.create(text='Лиса в норе', author=self.author)
+        out = StringIO()
+        with redirect_stdout(out):
+            call_command('migrate', verbosity=1, stdout=out)
+        self.assertNotIn('Индекс поиска перестроен', out.getvalue())
+        self.assertEqual(self.search('лиса'), [fox])
+        Post.objects.filter(pk=fox.pk).update(text='Лиса в лесу')
+        self.assertEqual(self.search('лесу'), [fox])
+        search.drop_triggers()
+        out = StringIO()
+        with redirect_stdout(out):
+            call_command('migrate', verbosity=2, stdout=out)
+        self.assertIn('Индекс поиска перестроен', out.getvalue())
+
+    def test_rebuild_search_index_command(self):
+        out = StringIO()
+        call_command('rebuild_search_index', batch=2, stdout=out)
+        self.assertIn('Проиндексировано постов: 3', out.getvalue())
+        self.assertEqual(self.search('птиц'), [
+            Post.objects.get(text='Про птиц')
+        ])
+
+
+class RebuildTimelinesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.follower = User.objects.create_user(username='test_follower')
+
+    def test_rebuild_timelines_command(self):
+        post = Post.objects.create(text='Тестовый пост', author=self.author)
+        Follow.objects.create(user=self.follower, author=self.author)
+        Timeline.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            list(Timeline.objects.values_list('user', 'post')),
+            [(self.follower.pk, post.pk)]
+        )
+
+
+class ReconcileCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.follower = User.objects.create_user(username='test_follower')
+
+    def test_reconcile_counters_command(self):
+        post = Post.objects.create(text='Тестовый пост', author=self.author)
+        Comment.objects.create(post=post, author=self.follower, text='Текст')
+        Profile.objects.filter(user=self.author).update(posts_count=7)
+        Post.objects.update(comments_count=0)
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('счётчиками: 2', out.getvalue())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            Profile.objects.get(user=self.author).posts_count, 1
+        )
+
+
+class ImportContentTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.follower = User.objects.create_user(username='test_follower')
+        cls.group = Group.objects.create(title='Группа', slug='test_group')
+
+    def import_content(self, *lines, **options):
+        out, err = StringIO(), StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'import.ndjson')
+            with open(path, 'w', encoding='utf-8') as file:
+                for line in lines:
+                    file.write(json.dumps(line, ensure_ascii=False) + '\n')
+            call_command(
+                'import_content', path, stdout=out, stderr=err, **options
+            )
+        return out.getvalue(), err.getvalue()
+
+    def test_import_rebuilds_derived_data(self):
+        """Импорт сохраняет даты и пересчитывает счётчики, ленты и индекс"""
+        out, err = self.import_content(
+            {'type': 'follow', 'user': 'test_follower',
+             'author': 'test_author'},
+            {'type': 'post', 'id': 'a1', 'text': 'Старый кот',
+             'author': 'test_author', 'group': 'test_group',
+             'pub_date': '2015-03-01T10:00:00'},
+            {'type': 'comment', 'post': 'a1', 'author': 'test_follower',
+             'text': 'Мяу', 'created': '2015-03-02T10:00:00'},
+            {'type': 'comment', 'post': 'b2', 'author': 'test_follower',
+             'text': 'Нет поста'},
+            {'type': 'post', 'text': 'Чужой', 'author': 'nobody'},
+            batch=2,
+        )
+        self.assertIn('постов: 1, комментариев: 1, подписок: 1', out)
+        self.assertIn('пропущено записей: 2', out)
+        self.assertIn("неизвестный пост 'b2'", err)
+        post = Post.objects.get()
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.comments.get().created.year, 2015)
+        self.assertEqual(self.author.profile.posts_count, 1)
+        self.assertEqual(self.author.profile.followers_count, 1)
+        self.assertTrue(
+            Timeline.objects.filter(user=self.follower, post=post).exists()
+        )
+        response = self.client.get(reverse('posts:search'), {'q': 'кот'})
+        self.assertEqual(list(response.context['page_obj']), [post])
+        Post.objects.filter(pk=post.pk).update(text='Пёс')
+        response = self.client.get(reverse('posts:search'), {'q': 'пёс'})
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    def test_import_creates_missing_users(self):
+        self.import_content(
+            {'type': 'post', 'text': 'Текст', 'author': 'legacy',
+             'group': 'legacy_group'},
+            create_missing=True,
+        )
+        post = Post.objects.select_related('author', 'group').get()
+        self.assertEqual(post.author.username, 'legacy')
+        self.assertFalse(post.author.has_usable_password())
+        self.assertEqual(post.group.slug, 'legacy_group')
+
+    def test_import_does_not_reuse_deleted_ids(self):
+        """Импорт не выдаёт id удалённых постов и не мешает вставкам"""
+        post = Post.objects.create(text='Удалён', author=self.author)
+        deleted = post.pk
+        post.delete()
+        self.import_content(
+            {'type': 'post', 'text': 'Первый', 'author': 'test_author'},
+            {'type': 'post', 'text': 'Второй', 'author': 'test_author'},
+        )
+        imported = list(Post.objects.order_by('pk').values_list(
+            'pk', flat=True
+        ))
+        self.assertEqual(imported, [deleted + 1, deleted + 2])
+        created = Post.objects.create(text='Новый', author=self.author)
+        self.assertEqual(created.pk, deleted + 3)
+
+
+class ExportContentTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.author = User.objects.create_user(username='test_author')
+        cls.posts = Post.objects.bulk_create(
+            Post(text=f'Пост {number}', author=cls.author)
+            for number in range(5)
+        )
+        # bulk_create минует сигналы счётчиков.
+        counters.reconcile()
+        Follow.objects.create(user=cls.admin, author=cls.author)
+
+    def test_export_command_round_trips(self):
+        """Выгрузка читается пачками и загружается import_content"""
+        out = StringIO()
+        with self.assertNumQueries(4):
+            call_command('export_content', 'post', chunk=2, stdout=out)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(
+            [record['text'] for record in records],
+            [f'Пост {number}' for number in range(5)],
+        )
+        self.assertEqual(records[0]['author'], 'test_author')
+        self.assertEqual(records[0]['type'], 'post')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'posts.ndjson')
+            call_command('export_content', 'post', output=path)
+            Post.objects.all().delete()
+            call_command('import_content', path, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 5)
+
+    def test_full_export_round_trips_groups(self):
+        """Выгрузка всех таблиц загружается обратно вместе с сообществами"""
+        group = Group.objects.create(title='Группа', slug='test_group')
+        Post.objects.filter(text='Пост 0').update(group=group)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'all.ndjson')
+            call_command('export_content', output=path)
+            Post.objects.all().delete()
+            Group.objects.all().delete()
+            out = StringIO()
+            call_command('import_content', path, stdout=out, stderr=out)
+        self.assertIn('сообществ: 1, постов: 5', out.getvalue())
+        self.assertIn('пропущено записей: 0', out.getvalue())
+        post = Post.objects.select_related('group').get(text='Пост 0')
+        self.assertEqual(
+            (post.group.slug, post.group.title), ('test_group', 'Группа')
+        )
+
+    def test_incremental_export(self):
+        last = Post.objects.order_by('pk').values_list('pk', flat=True)[3]
+        out = StringIO()
+        call_command('export_content', 'post', after_id=last, stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 1)
+        out = StringIO()
+        call_command(
+            'export_content', 'post', '--since=2100-01-01T00:00:00',
+            stdout=out,
+        )
+        self.assertEqual(out.getvalue(), '')
+
+
+@override_settings(SITEMAP_ROOT=TEMP_MEDIA_ROOT)
+class SitemapTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.group = Group.objects.create(title='Группа', slug='test_group')
+        cls.posts = [
+            Post.objects.create(text=f'Пост {number}', author=cls.author)
+            for number in range(3)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def build(self, chunk):
+        call_command(
+            'build_sitemaps', base_url='http://testserver/', chunk=chunk,
+            stdout=StringIO(),
+        )
+
+    def test_sitemap_chunks(self):
+        """Карта сайта делится на файлы по диапазонам id"""
+        self.build(chunk=2)
+        index = self.guest_client.get(reverse('posts:sitemap'))
+        self.assertEqual(index.status_code, 200)
+        content = b''.join(index.streaming_content).decode()
+        for section, number in (
+            ('posts', 1), ('posts', 2), ('groups', 1), ('profiles', 1)
+        ):
+            url = reverse('posts:sitemap_section', args=[section, number])
+            self.assertIn(f'<loc>http://testserver{url}</loc>', content)
+        second = self.guest_client.get(
+            reverse('posts:sitemap_section', args=['posts', 2])
+        )
+        content = b''.join(second.streaming_content).decode()
+        post = self.posts[2]
+        self.assertIn(
+            f'<loc>http://testserver/posts/{post.pk}/</loc>'
+            f'<lastmod>{post.updated.isoformat(timespec="seconds")}'
+            '</lastmod>',
+            content,
+        )
+        not_modified = self.guest_client.get(
+            reverse('posts:sitemap'),
+            HTTP_IF_MODIFIED_SINCE=index['Last-Modified'],
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_stale_chunks_removed(self):
+        self.build(chunk=1)
+        self.build(chunk=2)
+        response = self.guest_client.get(
+            reverse('posts:sitemap_section', args=['posts', 3])
+        )
+        self.assertEqual(response.status_code, 404)
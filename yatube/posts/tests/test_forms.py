@@ -1,12 +1,16 @@
+import hashlib
+import os
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
-from ..models import Comment, Group, Post, User
+from ..models import Comment, Group, Post, StoredImage, User
 
 CREATE = reverse('posts:post_create')
 PROFILE = reverse('posts:profile', kwargs={'username': 'test_author'})
@@ -18,6 +22,7 @@ SMALL_GIF = (
     b'\x02\x00\x01\x00\x00\x02\x02\x0C'
     b'\x0A\x00\x3B'
 )
+SMALL_GIF_HASH = hashlib.sha256(SMALL_GIF).hexdigest()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 UPLOADED = SimpleUploadedFile(
     name='small.gif',
@@ -82,7 +87,7 @@ class PostFormsTests(TestCase):
                 group=self.group,
                 text='test_text',
                 author=self.author,
-                image='posts/small.gif'
+                image=f'posts/{SMALL_GIF_HASH[:2]}/{SMALL_GIF_HASH}.gif'
             ).exists()
         )
 
@@ -106,6 +111,64 @@ class PostFormsTests(TestCase):
         self.assertEqual(edit_post.author, self.author)
         self.assertEqual(edit_post.group, self.group)
 
+    @override_settings(POST_IMAGE_MAX_PIXELS=1)
+    def test_decompression_bomb_rejected(self):
+        """Изображение с огромными размерами в заголовке отклоняется"""
+        posts_count = Post.objects.count()
+        response = self.authorized_author.post(CREATE, data={
+            'text': 'test_text',
+            'image': SimpleUploadedFile('bomb.gif', SMALL_GIF, 'image/gif'),
+        })
+        self.assertFormError(
+            response, 'form', 'image',
+            'Слишком большое изображение: 2×1 пикселей.'
+        )
+        self.assertEqual(Post.objects.count(), posts_count)
+
+    @override_settings(POST_IMAGE_MAX_EDGE=100)
+    def test_large_photo_downscaled_without_exif(self):
+        """Большие снимки уменьшаются, EXIF удаляется"""
+        photo = BytesIO()
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        Image.new('RGB', (300, 200)).save(photo, 'JPEG', exif=exif)
+        self.authorized_author.post(CREATE, data={
+            'text': 'test_photo',
+            'image': SimpleUploadedFile(
+                'photo.jpg', photo.getvalue(), 'image/jpeg'
+            ),
+        })
+        post = Post.objects.get(text='test_photo')
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (100, 67))
+            self.assertFalse(image.getexif())
+
+    def test_identical_uploads_stored_once(self):
+        """Одинаковые файлы хранятся один раз и считаются ссылки"""
+        for text in ('first', 'second'):
+            self.authorized_author.post(CREATE, data={
+                'text': text,
+                'image': SimpleUploadedFile('copy.gif', SMALL_GIF),
+            })
+        first = Post.objects.get(text='first')
+        second = Post.objects.get(text='second')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            StoredImage.objects.get(name=first.image.name).references, 2
+        )
+        self.assertEqual(
+            len(os.listdir(os.path.dirname(first.image.path))), 1
+        )
+        second.delete()
+        self.assertEqual(
+            StoredImage.objects.get(name=first.image.name).references, 1
+        )
+        first.delete()
+        self.assertFalse(
+            StoredImage.objects.filter(name=first.image.name).exists()
+        )
+
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class CommentFormTests(TestCase):
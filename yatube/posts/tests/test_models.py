@@ -1,5 +1,7 @@
+from django.db import connection
 from django.test import TestCase
 
+from core.paginators import CursorPaginator
 from posts.models import Comment, Follow, Group, Post, User
 
 
@@ -81,3 +83,50 @@ class FollowModelTest(TestCase):
         follow = FollowModelTest.follow
         expected_object_name = f'{follow.user} подписан на {follow.author}'
         self.assertEqual(expected_object_name, str(follow))
+
+
+class FeedIndexesTest(TestCase):
+    """Запросы лент используют составные индексы без сортировки в памяти"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='test_user')
+        cls.group = Group.objects.create(title='test', slug='test')
+        cls.post = Post.objects.create(
+            text='test_post', author=cls.user, group=cls.group
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.user, text='test_comment'
+        )
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return ' '.join(str(row[-1]) for row in cursor.fetchall())
+
+    def test_feed_queries_use_indexes(self):
+        feeds = {
+            'post_pub_date_idx': (
+                Post.objects.all(), ('-pub_date', '-id'), self.post
+            ),
+            'post_author_pub_date_idx': (
+                self.user.posts.all(), ('-pub_date', '-id'), self.post
+            ),
+            'post_group_pub_date_idx': (
+                self.group.group.all(), ('-pub_date', '-id'), self.post
+            ),
+            'comment_post_created_idx': (
+                self.post.comments.all(), ('-created', '-id'), self.comment
+            ),
+        }
+        for index, (queryset, ordering, row) in feeds.items():
+            paginator = CursorPaginator(queryset, 10, ordering)
+            cursor = paginator.decode_cursor(paginator.encode_cursor(row))
+            for values in (None, cursor):
+                with self.subTest(index=index, cursor=values):
+                    plan = self.explain(paginator.query(values)[:11])
+                    self.assertIn(index, plan)
+                    self.assertNotIn('TEMP B-TREE', plan)
+                    if values is not None:
+                        self.assertIn(f'{ordering[0][1:]}<?', plan)
@@ -1,3 +1,4 @@
+import json
 import shutil
 import tempfile
 
@@ -8,7 +9,15 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Follow, Group, Post, User
+from sorl.thumbnail import default
+from sorl.thumbnail.helpers import ThumbnailError
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core import generation, tasks
+from core.middleware import QueryBudgetExceeded
+from core.models import Task
+from .. import thumbnails
+from ..models import Comment, Follow, Group, Post, Profile, Timeline, User
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 INDEX = reverse('posts:index')
@@ -188,18 +197,112 @@ class PostViewsTests(TestCase):
         self.assertEqual(post_text, 'test_text')
 
     def test_cache_index_page(self):
-        """Тест кэша"""
+        """Тест кэша: лента кэшируется до изменения содержимого"""
         response = self.authorized_author.get(INDEX)
         content = response.content
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        response = self.authorized_author.get(INDEX)
+        self.assertEqual(content, response.content)
         Post.objects.create(
             text='Тестовый пост',
             author=self.author,
         )
         response = self.authorized_author.get(INDEX)
-        self.assertEqual(content, response.content)
-        cache.clear()
-        response = self.authorized_author.get(INDEX)
         self.assertNotEqual(content, response.content)
+        self.assertContains(response, 'Тестовый пост')
+
+    def test_thumbnail_placeholder(self):
+        """Пока миниатюра не готова, страница не ресайзит изображение"""
+        post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.author,
+            # Другой цвет палитры: файл не совпадает с картинкой self.post.
+            image=SimpleUploadedFile(
+                'placeholder.gif',
+                SMALL_GIF.replace(b'\xFF\xFF\xFF', b'\xFF\x00\x00', 1),
+            ),
+        )
+        url = reverse('posts:post_detail', args=[post.pk])
+        response = self.authorized_author.get(url)
+        self.assertContains(response, 'aspect-ratio')
+        self.assertNotContains(response, '<img class="card-img')
+        with override_settings(THUMBNAIL_ASYNC=False):
+            thumbnails.enqueue(post.image.name)
+        response = self.authorized_author.get(url)
+        self.assertContains(response, '<img class="card-img')
+        for width in settings.POST_IMAGE_WIDTHS:
+            self.assertContains(response, f' {width}w')
+        self.assertContains(response, 'width="960" height="339"')
+        if 'WEBP' in thumbnails.formats():
+            self.assertContains(response, 'type="image/webp"')
+
+    def test_thumbnails_prefetched_per_page(self):
+        """Миниатюры страницы загружаются одним запросом к БД"""
+        images = []
+        for color in (b'\x00\x00\x00', b'\x00\xFF\x00'):
+            post = Post.objects.create(
+                text='Пост с картинкой',
+                author=self.author,
+                image=SimpleUploadedFile(
+                    'prefetch.gif',
+                    SMALL_GIF.replace(b'\xFF\xFF\xFF', color, 1),
+                ),
+            )
+            thumbnails.generate(post.image.name)
+            images.append(post.image)
+        default.kvstore.clear_memory()
+        cache.clear()
+        with self.assertNumQueries(1):
+            thumbnails.prefetch(images)
+        with self.assertNumQueries(0):
+            for image in images:
+                self.assertIsNotNone(thumbnails.ready(image, 'card'))
+
+    def test_broken_image_not_requeued(self):
+        """Сбой генерации не меняет поколение и не ставит файл заново"""
+        post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.author,
+            image=SimpleUploadedFile(
+                'broken.gif',
+                SMALL_GIF.replace(b'\xFF\xFF\xFF', b'\x00\x00\xFF', 1),
+            ),
+        )
+        name = post.image.name
+        post.image.storage.delete(name)
+        before = generation.get()
+        with self.assertRaises(ThumbnailError), self.assertLogs('sorl'):
+            thumbnails.make(name)
+        self.assertEqual(generation.get(), before)
+        thumbnails._queued.clear()
+        self.authorized_author.get(
+            reverse('posts:post_detail', args=[post.pk])
+        )
+        self.assertFalse(Task.objects.exists())
+
+    def test_thumbnails_regenerated_despite_stale_lru(self):
+        """Миниатюры, удалённые другим процессом, создаются заново"""
+        post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.author,
+            image=SimpleUploadedFile(
+                'stale.gif',
+                SMALL_GIF.replace(b'\xFF\xFF\xFF', b'\xFF\x00\x00', 1),
+            ),
+        )
+        thumbnails.generate(post.image.name)
+        files = [
+            thumbnail.name
+            for _, thumbnail in thumbnails.ready(post.image, 'card')
+        ]
+        # Удаление в другом процессе: LRU этого процесса о нём не знает.
+        for name in files:
+            default.storage.delete(name)
+        KVStoreModel.objects.all().delete()
+        cache.clear()
+        thumbnails.generate(post.image.name)
+        for name in files:
+            self.assertTrue(default.storage.exists(name))
 
 
 class PaginatorViewsTest(TestCase):
@@ -223,6 +326,7 @@ class PaginatorViewsTest(TestCase):
             )
 
     def setUp(self):
+        cache.clear()
         self.unauthorized_client = Client()
 
     def test_paginator_on_pages(self):
@@ -244,6 +348,299 @@ class PaginatorViewsTest(TestCase):
                     posts_on_second_page
                 )
 
+    def test_follow_index_page_numbers(self):
+        """Лента подписок, как и остальные, листается по ?page="""
+        follower = User.objects.create_user(username='test_follower')
+        Follow.objects.create(user=follower, author=self.user)
+        client = Client()
+        client.force_login(follower)
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        per_page = settings.NUM_PAGES
+        for page, posts in (
+            ('1', expected[:per_page]), ('2', expected[per_page:])
+        ):
+            with self.subTest(page=page):
+                response = client.get(FOLLOW_INDEX, {'page': page})
+                self.assertEqual(list(response.context['page_obj']), posts)
+
+    def test_cursor_paginator_on_pages(self):
+        """Курсоры ?after= / ?before= листают ленту без пропусков"""
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'pk', flat=True
+            )
+        )
+        for reverse_ in (INDEX, GROUP_LIST, PROFILE):
+            with self.subTest(reverse_=reverse_):
+                first = self.unauthorized_client.get(
+                    reverse_).context['page_obj']
+                self.assertIsNone(first.previous_cursor)
+                second = self.unauthorized_client.get(
+                    reverse_ + '?after=' + first.next_cursor
+                ).context['page_obj']
+                self.assertIsNone(second.next_cursor)
+                self.assertEqual(
+                    [post.pk for post in first] + [post.pk for post in second],
+                    expected
+                )
+                back = self.unauthorized_client.get(
+                    reverse_ + '?before=' + second.previous_cursor
+                ).context['page_obj']
+                self.assertEqual(list(back), list(first))
+
+    def test_cached_pages_differ(self):
+        """Страницы ленты кэшируются каждая под своим ключом"""
+        for reverse_ in (INDEX, GROUP_LIST, PROFILE):
+            with self.subTest(reverse_=reverse_):
+                first = self.unauthorized_client.get(reverse_)
+                second = self.unauthorized_client.get(reverse_ + '?page=2')
+                self.assertNotEqual(first.content, second.content)
+                self.assertContains(second, '<p>Пост № 0</p>')
+                self.assertNotContains(first, '<p>Пост № 0</p>')
+
+    def test_invalid_cursor_returns_first_page(self):
+        response = self.unauthorized_client.get(INDEX + '?after=garbage')
+        self.assertEqual(
+            len(response.context['page_obj']), settings.NUM_PAGES
+        )
+
+
+@override_settings(COMMENTS_PER_PAGE=2)
+class CommentsViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.author)
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.author, text=f'Комментарий {i}'
+            )
+            for i in range(3)
+        ][::-1]
+        cls.POST_DETAIL = reverse('posts:post_detail', args=[cls.post.pk])
+        cls.COMMENTS = reverse('posts:comments', args=[cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_post_detail_shows_latest_comments(self):
+        """На странице поста только последние комментарии"""
+        comments = self.guest_client.get(
+            self.POST_DETAIL).context['comments']
+        self.assertEqual(list(comments), self.comments[:2])
+        response = self.guest_client.get(
+            self.POST_DETAIL + '?comments_after=' + comments.next_cursor
+        )
+        self.assertEqual(
+            list(response.context['comments']), self.comments[2:]
+        )
+
+    def test_comments_fragment(self):
+        """Более ранние комментарии подгружаются фрагментом"""
+        first = self.guest_client.get(self.POST_DETAIL).context['comments']
+        response = self.guest_client.get(
+            self.COMMENTS + '?after=' + first.next_cursor
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertContains(response, 'Комментарий 0')
+        self.assertNotContains(response, 'Комментарий 1')
+        self.assertNotContains(response, 'js-more-comments')
+
+    def test_comments_json(self):
+        response = self.guest_client.get(self.COMMENTS + '?format=json')
+        data = response.json()
+        self.assertEqual(
+            [comment['id'] for comment in data['comments']],
+            [comment.pk for comment in self.comments[:2]]
+        )
+        self.assertEqual(data['comments'][0]['author'], 'test_author')
+        self.assertIsNotNone(data['next'])
+
+
+class SearchViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.cat = Post.objects.create(
+            text='Кот спит на окне', author=cls.author
+        )
+        cls.dog = Post.objects.create(
+            text='Собака гонит кота, кот убегает', author=cls.author
+        )
+        Post.objects.create(text='Про птиц', author=cls.author)
+        cls.SEARCH = reverse('posts:search')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        response = self.guest_client.get(self.SEARCH, {'q': query, **params})
+        return response.context['page_obj']
+
+    def test_search_ranks_matches(self):
+        """Поиск находит посты по словам и префиксу, лучшие первыми"""
+        self.assertEqual(list(self.search('кот')), [self.dog, self.cat])
+        self.assertEqual(set(self.search('ок')), {self.cat})
+        self.assertEqual(list(self.search('кот окне')), [self.cat])
+
+    def test_search_follows_changes(self):
+        """Индекс обновляется при изменении и удалении постов"""
+        Post.objects.filter(pk=self.cat.pk).update(text='Ёж в траве')
+        self.assertEqual(list(self.search('ёж')), [self.cat])
+        self.assertEqual(list(self.search('окне')), [])
+        Post.objects.filter(pk=self.dog.pk).delete()
+        self.assertEqual(list(self.search('кот')), [])
+
+    def test_empty_and_operator_queries(self):
+        self.assertIsNone(self.search(''))
+        self.assertEqual(list(self.search('"кот" OR NEAR(')), [])
+
+    @override_settings(NUM_PAGES=1)
+    def test_search_cursor_pagination(self):
+        first = self.search('кот')
+        second = self.search('кот', after=first.next_cursor)
+        self.assertEqual(list(first) + list(second), [self.dog, self.cat])
+        self.assertIsNone(second.next_cursor)
+        self.assertEqual(
+            list(self.search('кот', before=second.previous_cursor)),
+            [self.dog]
+        )
+
+
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.author)
+        cls.POST_DETAIL = reverse('posts:post_detail', args=[cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_anonymous_pages_cached(self):
+        """Анонимным посетителям страницы отдаются из кэша целиком"""
+        for url in (INDEX, PROFILE, self.POST_DETAIL):
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(url)
+                self.assertIsNone(second.context)
+                self.assertEqual(first.content, second.content)
+                self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_conditional_get(self):
+        """Клиент с актуальной копией получает 304"""
+        response = self.guest_client.get(INDEX)
+        not_modified = self.guest_client.get(
+            INDEX, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(not_modified.status_code, 304)
+        not_modified = self.guest_client.get(
+            INDEX, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_new_content_invalidates_pages(self):
+        response = self.guest_client.get(INDEX)
+        Post.objects.create(text='Новый пост', author=self.author)
+        fresh = self.guest_client.get(
+            INDEX, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(fresh.status_code, 200)
+        self.assertContains(fresh, 'Новый пост')
+
+    def test_session_requests_not_cached(self):
+        client = Client()
+        client.force_login(self.author)
+        client.get(INDEX)
+        self.assertIsNotNone(client.get(INDEX).context)
+
+    def test_post_detail_etag(self):
+        """ETag поста меняется при правке поста и новом комментарии"""
+        client = Client()
+        client.force_login(self.author)
+        etag = client.get(self.POST_DETAIL)['ETag']
+        with self.assertNumQueries(3):
+            not_modified = client.get(
+                self.POST_DETAIL, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(not_modified.status_code, 304)
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий'
+        )
+        commented = client.get(self.POST_DETAIL)['ETag']
+        self.assertNotEqual(commented, etag)
+        self.post.text = 'Изменённый пост'
+        self.post.save()
+        edited = client.get(self.POST_DETAIL, HTTP_IF_NONE_MATCH=commented)
+        self.assertEqual(edited.status_code, 200)
+        self.assertNotEqual(edited['ETag'], commented)
+
+    def test_syndication_feeds(self):
+        """RSS/Atom-ленты кэшируются и обновляются с новыми постами"""
+        group = Group.objects.create(title='Группа', slug='test_group_slug')
+        Post.objects.filter(pk=self.post.pk).update(group=group)
+        for name, args in (
+            ('feed', []),
+            ('group_feed', [group.slug]),
+            ('profile_feed', [self.author.username]),
+        ):
+            for kind in ('rss', 'atom'):
+                url = reverse(f'posts:{name}_{kind}', args=args)
+                with self.subTest(url=url):
+                    response = self.guest_client.get(url)
+                    self.assertContains(response, 'Тестовый пост')
+                    self.assertIn('xml', response['Content-Type'])
+                    with self.assertNumQueries(0):
+                        not_modified = self.guest_client.get(
+                            url,
+                            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+                        )
+                    self.assertEqual(not_modified.status_code, 304)
+        url = reverse('posts:group_feed_rss', args=[group.slug])
+        Post.objects.create(text='Новый пост', author=self.author, group=group)
+        self.assertContains(self.guest_client.get(url), 'Новый пост')
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+    def test_post_detail_etag_follows_thumbnails(self):
+        """Готовые миниатюры меняют ETag страницы поста"""
+        self.addCleanup(shutil.rmtree, TEMP_MEDIA_ROOT, ignore_errors=True)
+        self.post.image = SimpleUploadedFile(
+            'etag.gif', SMALL_GIF, content_type='image/gif'
+        )
+        self.post.save()
+        client = Client()
+        client.force_login(self.author)
+        etag = client.get(self.POST_DETAIL)['ETag']
+        thumbnails.make(self.post.image.name)
+        response = client.get(self.POST_DETAIL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_post_detail_etag_follows_csrf_token(self):
+        """После повторного входа страница не отдаётся со старым токеном"""
+        client = Client()
+        client.force_login(self.author)
+        etag = client.get(self.POST_DETAIL)['ETag']
+        response = client.get(self.POST_DETAIL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 64
+        response = client.get(self.POST_DETAIL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_post_detail_etag_per_user(self):
+        client = Client()
+        client.force_login(self.author)
+        etag = client.get(self.POST_DETAIL)['ETag']
+        other = Client()
+        other.force_login(User.objects.create_user(username='other'))
+        response = other.get(self.POST_DETAIL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
 
 class FollowViewsTest(TestCase):
     @classmethod
@@ -316,3 +713,288 @@ class FollowViewsTest(TestCase):
         response = authorized_user.get(FOLLOW_INDEX)
         posts = response.context['page_obj']
         self.assertNotIn(post, posts)
+
+    def test_timeline_filled_on_post_and_purged_on_unfollow(self):
+        """Лента подписок пополняется при публикации и чистится при отписке"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(text='Тестовый пост', author=self.author)
+        self.assertTrue(
+            Timeline.objects.filter(user=self.follower, post=post).exists()
+        )
+        self.authorized_follower.get(reverse(
+            'posts:profile_unfollow', args=[self.author.username]
+        ))
+        self.assertFalse(Timeline.objects.filter(user=self.follower).exists())
+
+    @override_settings(FEED_INLINE_FANOUT=0)
+    def test_large_fanout_deferred_to_task_queue(self):
+        """Раскладка автора со многими подписчиками идёт через очередь"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(text='Тестовый пост', author=self.author)
+        self.assertFalse(Timeline.objects.filter(post=post).exists())
+        for pk in tasks.claim(10):
+            self.assertTrue(tasks.run(pk))
+        self.assertTrue(
+            Timeline.objects.filter(user=self.follower, post=post).exists()
+        )
+
+    @override_settings(TIMELINE_LENGTH=2)
+    def test_timeline_trimmed(self):
+        """Лента подписок ограничена TIMELINE_LENGTH записями"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        posts = [
+            Post.objects.create(text=f'Пост № {i}', author=self.author)
+            for i in range(3)
+        ]
+        response = self.authorized_follower.get(FOLLOW_INDEX)
+        self.assertEqual(list(response.context['page_obj']), posts[:0:-1])
+
+    @override_settings(FEED_FANOUT_THRESHOLD=1)
+    def test_feed_merges_pushed_and_pulled_authors(self):
+        """Посты популярных авторов подтягиваются при чтении ленты"""
+        popular = User.objects.create_user(username='test_popular')
+        fan = User.objects.create_user(username='test_fan')
+        Follow.objects.create(user=fan, author=popular)
+        Follow.objects.create(user=self.follower, author=popular)
+        Follow.objects.create(user=self.follower, author=self.author)
+        posts = [
+            Post.objects.create(
+                text=f'Пост № {i}',
+                author=(popular, self.author)[i % 2],
+            )
+            for i in range(settings.NUM_PAGES + 2)
+        ]
+        self.assertFalse(Timeline.objects.filter(post__author=popular))
+        first = self.authorized_follower.get(
+            FOLLOW_INDEX).context['page_obj']
+        second = self.authorized_follower.get(
+            FOLLOW_INDEX + '?after=' + first.next_cursor
+        ).context['page_obj']
+        self.assertEqual(list(first) + list(second), posts[::-1])
+
+    @override_settings(FEED_FANOUT_THRESHOLD=1, TASKS_EAGER=True)
+    def test_timelines_restored_when_author_drops_to_threshold(self):
+        """Посты, которые подтягивались при чтении, попадают в ленты,
+        когда автор опускается до порога подписчиков"""
+        fan = User.objects.create_user(username='test_fan')
+        Follow.objects.create(user=fan, author=self.author)
+        follow = Follow.objects.create(
+            user=self.follower, author=self.author
+        )
+        post = Post.objects.create(text='Тестовый пост', author=self.author)
+        self.assertFalse(Timeline.objects.filter(post=post).exists())
+        follow.delete()
+        self.assertTrue(
+            Timeline.objects.filter(user=fan, post=post).exists()
+        )
+        fan_client = Client()
+        fan_client.force_login(fan)
+        response = fan_client.get(FOLLOW_INDEX)
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+
+class QueryCountViewsTest(TestCase):
+    """Число запросов к БД не зависит от количества постов на странице"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.follower = User.objects.create_user(username='test_follower')
+        groups = [
+            Group.objects.create(title=f'group_{i}', slug=f'group_{i}')
+            for i in range(3)
+        ]
+        authors = [
+            User.objects.create_user(username=f'test_author_{i}')
+            for i in range(3)
+        ]
+        for author in authors:
+            Follow.objects.create(user=cls.follower, author=author)
+        for i in range(settings.NUM_PAGES + 3):
+            post = Post.objects.create(
+                text=f'Пост № {i}',
+                author=authors[i % 3],
+                group=groups[i % 3],
+            )
+        for commentator in authors:
+            Comment.objects.create(
+                post=post, author=commentator, text='Комментарий'
+            )
+        cls.post = post
+        cls.author = post.author
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_follower = Client()
+        self.authorized_follower.force_login(self.follower)
+
+    def test_guest_pages_query_count(self):
+        pages = {
+            INDEX: 1,
+            reverse('posts:group_list', args=[self.post.group.slug]): 2,
+            reverse('posts:profile', args=[self.author.username]): 2,
+            reverse('posts:post_detail', args=[self.post.pk]): 3,
+        }
+        for url, queries in pages.items():
+            with self.subTest(url=url), self.assertNumQueries(queries):
+                self.guest_client.get(url)
+
+    def test_cached_feed_query_count(self):
+        """Лента из кэша фрагментов не обращается к постам"""
+        self.guest_client.get(INDEX)
+        with self.assertNumQueries(0):
+            self.guest_client.get(INDEX)
+
+    def test_follow_index_query_count(self):
+        with self.assertNumQueries(4):
+            self.authorized_follower.get(FOLLOW_INDEX)
+
+    @override_settings(FEED_FANOUT_THRESHOLD=0)
+    def test_pulled_authors_read_in_one_query(self):
+        """Посты подтягиваемых авторов читаются одним запросом"""
+        with self.assertNumQueries(5):
+            self.authorized_follower.get(FOLLOW_INDEX)
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+    def test_cold_pages_within_budgets(self):
+        """Страницы с неготовыми миниатюрами укладываются в лимиты"""
+        Post.objects.filter(pk=self.post.pk).update(image='posts/small.gif')
+        pages = (
+            INDEX,
+            reverse('posts:group_list', args=[self.post.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            FOLLOW_INDEX,
+        )
+        for url in pages:
+            with self.subTest(url=url):
+                cache.clear()
+                thumbnails._queued.clear()
+                default.kvstore.clear_memory()
+                response = self.authorized_follower.get(url)
+                self.assertLessEqual(
+                    response.wsgi_request.query_count,
+                    settings.QUERY_BUDGETS[response.resolver_match.view_name],
+                )
+
+    def test_query_budget_exceeded(self):
+        with override_settings(QUERY_BUDGETS={'posts:index': 0}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.guest_client.get(INDEX)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.follower = User.objects.create_user(username='test_follower')
+
+    def setUp(self):
+        self.authorized_follower = Client()
+        self.authorized_follower.force_login(self.follower)
+
+    def test_counters_follow_views(self):
+        """Счётчики обновляются при публикации, комментарии и подписке"""
+        post = Post.objects.create(text='Тестовый пост', author=self.author)
+        self.authorized_follower.post(
+            reverse('posts:add_comment', args=[post.pk]),
+            data={'text': 'Комментарий'},
+        )
+        self.authorized_follower.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            Profile.objects.values_list(
+                'user', 'posts_count', 'followers_count', 'following_count'
+            ).order_by('user').get(user=self.author),
+            (self.author.pk, 1, 1, 0)
+        )
+        self.assertEqual(self.follower.profile.following_count, 1)
+        self.authorized_follower.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.follower.profile.refresh_from_db()
+        self.assertEqual(self.follower.profile.following_count, 0)
+        post.delete()
+        self.author.profile.refresh_from_db()
+        self.assertEqual(self.author.profile.posts_count, 0)
+
+    def test_delete_with_drifted_counters(self):
+        """Удаление не падает, если счётчик уже обнулён"""
+        Post.objects.bulk_create(
+            [Post(text='Тестовый пост', author=self.author)]
+        )
+        post = Post.objects.get()
+        Comment.objects.bulk_create(
+            [Comment(post=post, author=self.follower, text='Текст')]
+        )
+        Follow.objects.bulk_create(
+            [Follow(user=self.follower, author=self.author)]
+        )
+        Comment.objects.get().delete()
+        self.assertEqual(
+            Post.objects.values_list('comments_count', flat=True).get(), 0
+        )
+        Follow.objects.get().delete()
+        post.delete()
+        self.assertEqual(
+            list(Profile.objects.values_list(
+                'posts_count', 'followers_count', 'following_count'
+            )),
+            [(0, 0, 0), (0, 0, 0)]
+        )
+
+    def test_profile_created_with_user(self):
+        """Счётчики нового пользователя не пересчитываются при просмотре"""
+        user = User.objects.create_user(username='test_newcomer')
+        self.assertEqual(Profile.objects.get(user=user).posts_count, 0)
+        with self.assertNumQueries(2):
+            self.client.get(reverse('posts:profile', args=[user.username]))
+
+
+class ExportViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.author = User.objects.create_user(username='test_author')
+        Post.objects.create(text='Тестовый пост', author=cls.author)
+        Follow.objects.create(user=cls.admin, author=cls.author)
+
+    def setUp(self):
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+
+    def test_export_endpoint(self):
+        """Выгрузка по HTTP доступна только администраторам"""
+        url = reverse('posts:export', args=['follow'])
+        response = self.admin_client.get(url, {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            b''.join(response.streaming_content).decode().splitlines(),
+            ['id,user,author', f'{Follow.objects.get().pk},admin,test_author'],
+        )
+        response = self.admin_client.get(url, {'since': 'вчера'})
+        self.assertEqual(response.status_code, 400)
+        response = self.admin_client.get(
+            reverse('posts:export', args=['post']),
+            {'since': '', 'after_id': ''},
+        )
+        records = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(record)['text'] for record in records],
+            ['Тестовый пост']
+        )
+        response = self.admin_client.get(
+            reverse('posts:export', args=['user'])
+        )
+        self.assertEqual(response.status_code, 404)
+        guest = Client()
+        guest.force_login(self.author)
+        response = guest.get(url)
+        self.assertEqual(response.status_code, 302)
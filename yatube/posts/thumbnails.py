@@ -0,0 +1,287 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image
+from sorl.thumbnail import base, default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import ThumbnailError
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core import generation, tasks
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+Variant = namedtuple('Variant', 'format width height geometry options')
+
+# Сколько секунд процесс не ставит повторно уже поставленный файл.
+QUEUED_TTL = 60
+
+_queued = {}
+_lock = threading.Lock()
+
+
+class ThumbnailBackend(base.ThumbnailBackend):
+    """Бэкенд sorl, умеющий отдать миниатюру, не создавая её."""
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """Файл миниатюры с теми же именем и ключом, что у get_thumbnail."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра из хранилища ключей или None."""
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options)
+        )
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    """Хранилище ключей sorl в три уровня: LRU процесса, общий кэш, БД.
+
+    В LRU попадают только найденные записи: о миниатюре, созданной в
+    другом процессе, этот процесс узнает из общего кэша. Об удалении
+    в другом процессе LRU не узнает, поэтому генерация читает записи
+    мимо него (см. shared).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lru = OrderedDict()
+        self._lru_lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def shared(self):
+        """Блок, в котором записи читаются из общего кэша и БД.
+
+        Устаревшие записи LRU при этом заменяются или вытесняются.
+        """
+        self._local.shared = True
+        try:
+            yield
+        finally:
+            self._local.shared = False
+
+    def _remember(self, items):
+        with self._lru_lock:
+            for key, value in items:
+                self._lru[key] = value
+                self._lru.move_to_end(key)
+            while len(self._lru) > settings.THUMBNAIL_LRU_SIZE:
+                self._lru.popitem(last=False)
+
+    def _get_raw(self, key):
+        shared = getattr(self._local, 'shared', False)
+        if not shared:
+            with self._lru_lock:
+                value = self._lru.get(key)
+                if value is not None:
+                    self._lru.move_to_end(key)
+                    return value
+        value = super()._get_raw(key)
+        if value is not None:
+            self._remember([(key, value)])
+        elif shared:
+            with self._lru_lock:
+                self._lru.pop(key, None)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self._remember([(key, value)])
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        with self._lru_lock:
+            for key in keys:
+                self._lru.pop(key, None)
+
+    def clear(self, delete_thumbnails=False):
+        super().clear(delete_thumbnails)
+        self.clear_memory()
+
+    def clear_memory(self):
+        """Очищает LRU этого процесса."""
+        with self._lru_lock:
+            self._lru.clear()
+
+    def prefetch(self, image_files):
+        """Загружает записи одним get_many и одним запросом к БД."""
+        keys = [add_prefix(image_file.key) for image_file in image_files]
+        with self._lru_lock:
+            missing = [key for key in keys if key not in self._lru]
+        if not missing:
+            return
+        found = self.cache.get_many(missing)
+        absent = [key for key in missing if key not in found]
+        if absent:
+            rows = dict(KVStoreModel.objects.filter(
+                key__in=absent
+            ).values_list('key', 'value'))
+            self.cache.set_many(
+                {key: rows.get(key, EMPTY_VALUE) for key in absent},
+                thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT,
+            )
+            found.update(rows)
+        self._remember(
+            (key, value) for key, value in found.items()
+            if value is not EMPTY_VALUE
+        )
+
+
+def formats():
+    """Форматы из settings.POST_IMAGE_FORMATS, доступные в сборке Pillow."""
+    Image.init()
+    return [
+        image_format for image_format in settings.POST_IMAGE_FORMATS
+        if image_format in Image.SAVE
+    ]
+
+
+def variants(name):
+    """Варианты миниатюры name по ширинам и форматам, с её пропорциями."""
+    geometry, options = settings.POST_THUMBNAILS[name]
+    width, height = map(int, geometry.split('x'))
+    return [
+        Variant(
+            image_format, size, round(height * size / width),
+            f'{size}x{round(height * size / width)}',
+            {**options, 'format': image_format},
+        )
+        for image_format in formats()
+        for size in settings.POST_IMAGE_WIDTHS
+    ]
+
+
+def _lookup(image, name):
+    found = []
+    for variant in variants(name):
+        thumbnail = default.backend.get_ready_thumbnail(
+            image, variant.geometry, **variant.options
+        )
+        if thumbnail is None:
+            return None
+        found.append((variant, thumbnail))
+    return found
+
+
+def prefetch(images, name='card'):
+    """Загружает в LRU записи о вариантах миниатюр для всех images.
+
+    Недостающие миниатюры ставятся в очередь одним запросом.
+    """
+    images = [image for image in images if image]
+    default.kvstore.prefetch([
+        default.backend.thumbnail_file(
+            image, variant.geometry, **variant.options
+        )
+        for image in images
+        for variant in variants(name)
+    ])
+    enqueue(*[
+        image.name for image in images if _lookup(image, name) is None
+    ])
+
+
+def ready(image, name):
+    """Готовые варианты миниатюры: [(вариант, миниатюра)] или None.
+
+    Если хотя бы одного варианта нет, генерация ставится в очередь.
+    """
+    found = _lookup(image, name)
+    if found is None:
+        enqueue(image.name)
+    return found
+
+
+def _failed_key(name):
+    return f'thumbnails:failed:{name}'
+
+
+def generate(name):
+    """Создаёт все варианты миниатюр из settings.POST_THUMBNAILS.
+
+    Ошибки чтения исходника sorl только пишет в лог, поэтому результат
+    проверяется по хранилищу ключей. Если вариантов не хватает, файл
+    на THUMBNAIL_FAILED_TIMEOUT секунд считается сбойным (страницы не
+    ставят его в очередь) и выбрасывается ThumbnailError. LRU процесса
+    не используется: миниатюры могли удалить в другом процессе.
+    """
+    # Ключи sorl зависят от хранилища, поэтому берём хранилище поля.
+    source = ImageFile(name, Post._meta.get_field('image').storage)
+    with default.kvstore.shared():
+        for thumbnail in settings.POST_THUMBNAILS:
+            for variant in variants(thumbnail):
+                get_thumbnail(source, variant.geometry, **variant.options)
+            if _lookup(source, thumbnail) is None:
+                cache.set(
+                    _failed_key(name), True,
+                    settings.THUMBNAIL_FAILED_TIMEOUT,
+                )
+                raise ThumbnailError(f'Не удалось создать миниатюры {name}')
+    cache.delete(_failed_key(name))
+
+
+@tasks.task
+def make(name):
+    """Задача очереди: миниатюры файла name.
+
+    При ошибке задача повторяется с паузой, а поколение не меняется.
+    """
+    generate(name)
+    # Закэшированные страницы с заглушкой пора перерисовать.
+    generation.bump()
+
+
+def enqueue(*names):
+    """Ставит генерацию миниатюр в очередь задач (core.tasks).
+
+    Страницы с заглушкой ставят файл при каждом показе, поэтому процесс
+    помнит поставленные файлы QUEUED_TTL секунд и не пишет в БД
+    повторно. Сбойные файлы (см. generate) не ставятся. При
+    THUMBNAIL_ASYNC = False миниатюры создаются сразу.
+    """
+    names = [name for name in names if name]
+    if not settings.THUMBNAIL_ASYNC:
+        for name in names:
+            try:
+                generate(name)
+            except ThumbnailError:
+                logger.exception('Миниатюры %s не созданы', name)
+        return
+    now = time.monotonic()
+    with _lock:
+        names = [
+            name for name in names
+            if now - _queued.get(name, now - QUEUED_TTL) >= QUEUED_TTL
+        ]
+        if len(_queued) > settings.THUMBNAIL_LRU_SIZE:
+            _queued.clear()
+        _queued.update(dict.fromkeys(names, now))
+    if names:
+        failed = cache.get_many([_failed_key(name) for name in names])
+        names = [name for name in names if _failed_key(name) not in failed]
+    tasks.enqueue_many(
+        make, [([name], f'thumbnails:{name}') for name in names]
+    )
@@ -0,0 +1,136 @@
+from django.conf import settings
+
+from core import tasks
+
+from .models import Follow, Post, Profile, Timeline
+
+
+def is_pulled(author_id):
+    """Посты авторов с числом подписчиков выше порога не раскладываются
+    по лентам, а подтягиваются при чтении."""
+    return Profile.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.FEED_FANOUT_THRESHOLD,
+    ).exists()
+
+
+def pulled_authors(user_id):
+    return Follow.objects.filter(
+        user_id=user_id,
+        author__profile__followers_count__gt=settings.FEED_FANOUT_THRESHOLD,
+    ).values_list('author_id', flat=True)
+
+
+def _entries(user_ids, posts):
+    return [
+        Timeline(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+        for user_id in user_ids
+        for post in posts
+    ]
+
+
+def trim(user_id):
+    """Оставляет в ленте пользователя TIMELINE_LENGTH последних записей."""
+    stale = Timeline.objects.filter(user_id=user_id).order_by(
+        '-pub_date', '-post_id'
+    ).values('pk')[settings.TIMELINE_LENGTH:]
+    Timeline.objects.filter(pk__in=stale).delete()
+
+
+def push(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    followers = list(
+        Follow.objects.filter(author_id=post.author_id).values_list(
+            'user_id', flat=True
+        )
+    )
+    Timeline.objects.bulk_create(
+        _entries(followers, [post]), ignore_conflicts=True
+    )
+    for user_id in followers:
+        trim(user_id)
+
+
+@tasks.task
+def push_later(post_id):
+    """Задача очереди: раскладка поста post_id."""
+    post = Post.objects.filter(pk=post_id).only(
+        'pk', 'pub_date', 'author'
+    ).first()
+    if post is not None:
+        push(post)
+
+
+def schedule_push(post):
+    """Раскладывает пост сразу, если у автора немного подписчиков
+    (settings.FEED_INLINE_FANOUT), иначе — через очередь задач."""
+    followers = Profile.objects.filter(user_id=post.author_id).values_list(
+        'followers_count', flat=True
+    ).first() or 0
+    if followers <= settings.FEED_INLINE_FANOUT:
+        push(post)
+    else:
+        tasks.enqueue(push_later, [post.pk])
+
+
+def backfill(user_id, author_id):
+    if is_pulled(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).only('pk', 'pub_date')[:settings.TIMELINE_LENGTH]
+    Timeline.objects.bulk_create(
+        _entries([user_id], posts), ignore_conflicts=True
+    )
+    trim(user_id)
+
+
+@tasks.task
+def restore(author_id):
+    """Задача очереди: дополняет ленты подписчиков постами автора.
+
+    Пока число подписчиков было выше порога, посты автора не
+    раскладывались; когда оно опускается до порога, чтение перестаёт их
+    подтягивать, поэтому ленты заполняются заново.
+    """
+    if is_pulled(author_id):
+        return
+    posts = list(Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).only('pk', 'pub_date')[:settings.TIMELINE_LENGTH])
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True
+    )
+    for user_id in list(followers):
+        Timeline.objects.bulk_create(
+            _entries([user_id], posts), ignore_conflicts=True
+        )
+        trim(user_id)
+
+
+def unfollowed(author_id):
+    """Ставит restore, если автор только что опустился до порога."""
+    crossed = Profile.objects.filter(
+        user_id=author_id,
+        followers_count=settings.FEED_FANOUT_THRESHOLD,
+    ).exists()
+    if crossed:
+        tasks.enqueue(restore, [author_id], key=f'timeline:{author_id}')
+
+
+def purge(user_id, author_id):
+    Timeline.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def rebuild(user_id):
+    Timeline.objects.filter(user_id=user_id).delete()
+    posts = Post.objects.filter(author__following__user_id=user_id).exclude(
+        author_id__in=list(pulled_authors(user_id))
+    ).order_by(
+        '-pub_date', '-id'
+    ).only('pk', 'pub_date')[:settings.TIMELINE_LENGTH]
+    Timeline.objects.bulk_create(_entries([user_id], posts))
@@ -1,17 +1,48 @@
 from django.urls import path
 
-from . import views
+from . import syndication, views
 
 app_name = 'posts'
 
 urlpatterns = [
+    path('atom/', syndication.LatestPostsAtomFeed(), name='feed_atom'),
+    path('rss/', syndication.LatestPostsFeed(), name='feed_rss'),
     path('create/', views.post_create, name='post_create'),
+    path('export/<str:kind>/', views.export_content, name='export'),
     path('follow/', views.follow_index, name='follow_index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path(
+        'group/<slug:slug>/atom/',
+        syndication.GroupPostsAtomFeed(),
+        name='group_feed_atom'
+    ),
+    path(
+        'group/<slug:slug>/rss/',
+        syndication.GroupPostsFeed(),
+        name='group_feed_rss'
+    ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('posts/<int:post_id>/comment', views.add_comment, name='add_comment'),
+    path('posts/<int:post_id>/comments/', views.comments, name='comments'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/atom/',
+        syndication.AuthorPostsAtomFeed(),
+        name='profile_feed_atom'
+    ),
+    path(
+        'profile/<str:username>/rss/',
+        syndication.AuthorPostsFeed(),
+        name='profile_feed_rss'
+    ),
+    path('search/', views.post_search, name='search'),
+    path('sitemap.xml', views.sitemap, name='sitemap'),
+    path(
+        'sitemap-<slug:section>-<int:number>.xml',
+        views.sitemap,
+        name='sitemap_section'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
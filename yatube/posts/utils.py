@@ -0,0 +1,72 @@
+import hashlib
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import OuterRef, Subquery
+from django.middleware.csrf import get_token
+
+from core import generation
+from core.paginators import CursorPaginator
+
+from .models import Comment, Post
+
+FEED_ORDERING = ('-pub_date', '-id')
+COMPACT_JSON = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+def paginate(request, queryset, ordering=FEED_ORDERING):
+    """Страница ленты: по курсору, либо по номеру при явном ?page=."""
+    if 'page' in request.GET:
+        paginator = Paginator(
+            queryset.order_by(*ordering), settings.NUM_PAGES
+        )
+        return paginator.get_page(request.GET.get('page'))
+    paginator = CursorPaginator(queryset, settings.NUM_PAGES, ordering)
+    return paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+
+
+def comments_page(comments, after=None):
+    """Страница комментариев от новых к старым по курсору (created, id)."""
+    paginator = CursorPaginator(
+        comments.select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        ('-created', '-id'),
+    )
+    return paginator.get_page(after=after)
+
+
+def post_etag(request, post_id):
+    """ETag страницы поста по отметкам времени, без загрузки объектов.
+
+    Один запрос: дата изменения поста, его группы, последнего комментария
+    (по индексу post, created) и число постов автора. В ключ входят
+    пользователь и страница комментариев — от них зависит разметка, —
+    CSRF-токен формы комментария, который меняется при входе, а также
+    поколение содержимого (core.generation): его меняют и изменения без
+    отметок времени, например готовые миниатюры.
+    """
+    latest_comment = Comment.objects.filter(
+        post=OuterRef('pk')
+    ).order_by('-created', '-id').values('updated')[:1]
+    state = Post.objects.filter(pk=post_id).annotate(
+        latest_comment=Subquery(latest_comment)
+    ).values_list(
+        'updated', 'group__updated', 'latest_comment',
+        'author__profile__posts_count',
+    ).first()
+    if state is None:
+        return None
+    csrf = None
+    if request.user.is_authenticated:
+        # get_token создаёт токен до рендера, если cookie ещё нет:
+        # страница получит тот же токен, что вошёл в ETag.
+        get_token(request)
+        csrf = request.META['CSRF_COOKIE']
+    raw = repr((
+        state, generation.get(), request.user.pk, csrf,
+        request.GET.get('comments_after'),
+    )).encode()
+    return hashlib.md5(raw).hexdigest()
@@ -1,17 +1,29 @@
 from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.http import (
+    Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import urlencode
+from django.views.decorators.http import etag
+from django.views.static import serve
 
+from . import counters, export, search, sitemaps, thumbnails
+from .feed import FollowFeed
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
+from .utils import COMPACT_JSON, comments_page, paginate, post_etag
 
 
 def index(request):
-    posts = Post.objects.all()
-    paginator = Paginator(posts, settings.NUM_PAGES)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.select_related('author', 'group')
+    # Страница вычисляется лениво: при попадании в кэш фрагмента
+    # ленты запрос к БД не выполняется.
+    page_obj = SimpleLazyObject(lambda: paginate(request, posts))
     title = 'Последние обновления на сайте'
     context = {
         'page_obj': page_obj,
@@ -23,10 +35,8 @@ def index(request):
 
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.group.all()
-    paginator = Paginator(posts, settings.NUM_PAGES)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = group.group.select_related('author', 'group')
+    page_obj = SimpleLazyObject(lambda: paginate(request, posts))
     context = {
         'posts': posts,
         'group': group,
@@ -36,15 +46,15 @@ def group_posts(request, slug):
 
 
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post = author.posts.all()
-    number_of_posts = author.posts.count()
-    paginator = Paginator(post, settings.NUM_PAGES)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    following = Follow.objects.filter(
-        user__username=request.user, author=author
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username
     )
+    post = author.posts.select_related('author', 'group')
+    number_of_posts = counters.profile_of(author).posts_count
+    page_obj = SimpleLazyObject(lambda: paginate(request, post))
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author=author
+    ).exists()
     context = {
         'page_obj': page_obj,
         'author': author,
@@ -54,11 +64,14 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@etag(post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    posts_count = post.author.posts.all().count()
+    post = get_object_or_404(
+        Post.objects.select_related('author__profile', 'group'), pk=post_id
+    )
+    posts_count = counters.profile_of(post.author).posts_count
     form = CommentForm()
-    comments = post.comments.all()
+    comments = comments_page(post.comments, request.GET.get('comments_after'))
     title = str(post)
     context = {
         'post': post,
@@ -70,7 +83,62 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = search.search(
+        query,
+        settings.NUM_PAGES,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'paginator_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@staff_member_required
+def export_content(request, kind):
+    """Потоковая выгрузка таблицы kind в NDJSON или CSV для аналитики."""
+    if kind not in export.EXPORTS:
+        raise Http404
+    if not request.user.has_perm(f'posts.view_{kind}'):
+        raise PermissionDenied
+    try:
+        # Пустые параметры (?since=) означают «без ограничения».
+        since = request.GET.get('since') or None
+        after_id = request.GET.get('after_id') or None
+        params = {
+            'since': since and export.parse_since(since),
+            'after_id': after_id and int(after_id),
+        }
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    if request.GET.get('format') == 'csv':
+        lines = export.csv_lines(kind, **params)
+        content_type, extension = 'text/csv; charset=utf-8', 'csv'
+    else:
+        lines = export.ndjson([kind], **params)
+        content_type, extension = 'application/x-ndjson', 'ndjson'
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="{kind}.{extension}"'
+    )
+    return response
+
+
+def sitemap(request, section=None, number=None):
+    """Отдаёт карту сайта, заранее собранную командой build_sitemaps."""
+    name = sitemaps.INDEX
+    if section is not None:
+        name = sitemaps.chunk_name(section, number)
+    return serve(request, name, document_root=settings.SITEMAP_ROOT)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -82,7 +150,8 @@ def post_create(request):
         form.text = text
         form.group = group
         form.instance.author = request.user
-        form.save()
+        post = form.save()
+        thumbnails.enqueue(post.image.name)
         return redirect('posts:profile', request.user)
     else:
         context = {'form': form}
@@ -102,6 +171,8 @@ def post_edit(request, post_id):
         return redirect('posts:post_detail', post_id=post_id)
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            thumbnails.enqueue(post.image.name)
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'post': post,
@@ -111,7 +182,34 @@ def post_edit(request, post_id):
     return render(request, 'posts/create_post.html', context)
 
 
+def comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    page = comments_page(post.comments, request.GET.get('after'))
+    if request.GET.get('format') == 'json':
+        return JsonResponse(
+            {
+                'comments': [
+                    {
+                        'id': comment.pk,
+                        'author': comment.author.username,
+                        'text': comment.text,
+                        'created': comment.created.isoformat(),
+                    }
+                    for comment in page
+                ],
+                'next': page.next_cursor,
+            },
+            json_dumps_params=COMPACT_JSON,
+        )
+    context = {
+        'post': post,
+        'comments': page,
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -125,15 +223,24 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, settings.NUM_PAGES)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if 'page' in request.GET:
+        # Номер страницы считается по постам подписок напрямую: Timeline
+        # хранит лишь последние записи и без подтягиваемых авторов.
+        posts = Post.objects.filter(
+            author__following__user=request.user
+        ).select_related('author', 'group')
+        page_obj = paginate(request, posts)
+    else:
+        page_obj = FollowFeed(request.user, settings.NUM_PAGES).get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
     context = {'page_obj': page_obj}
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
@@ -142,6 +249,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     follow_obj = Follow.objects.filter(author=author, user=request.user)
@@ -2,6 +2,7 @@ from django.contrib.auth.views import LoginView, LogoutView, PasswordResetView
 from django.urls import path
 
 from . import views
+from .forms import QueuedPasswordResetForm
 
 app_name = 'users'
 
@@ -19,5 +20,7 @@ urlpatterns = [
     ),
     path(
         'password_reset/',
-        PasswordResetView.as_view(), name='password_reset'),
+        PasswordResetView.as_view(form_class=QueuedPasswordResetForm),
+        name='password_reset'
+    ),
 ]
@@ -24,6 +24,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
+    'core.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -35,16 +37,139 @@ MIDDLEWARE = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Файлы карты сайта, собранные командой build_sitemaps.
+SITEMAP_ROOT = os.path.join(BASE_DIR, 'sitemaps')
+
+# Адрес сайта для абсолютных ссылок, которые строятся вне запроса.
+SITE_URL = 'http://localhost:8000'
+
+# Имена медиафайлов зависят от содержимого, поэтому их URL неизменны.
+MEDIA_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+THUMBNAIL_BACKEND = 'posts.thumbnails.ThumbnailBackend'
+
+THUMBNAIL_KVSTORE = 'posts.thumbnails.KVStore'
+
+# Сколько записей о миниатюрах держать в памяти каждого процесса.
+THUMBNAIL_LRU_SIZE = 10000
+
+# Миниатюры изображений постов: имя -> (геометрия, параметры sorl).
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+# Каждая миниатюра создаётся в этих ширинах и форматах для srcset.
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+
+POST_IMAGE_SIZES = '(max-width: 1000px) 100vw, 960px'
+
+# Загрузки сразу пишутся во временные файлы, а не в память.
+FILE_UPLOAD_HANDLERS = (
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+)
+
+POST_IMAGE_MAX_PIXELS = 40_000_000
+
+POST_IMAGE_MAX_EDGE = 2560
+
+THUMBNAIL_ASYNC = True
+
+# Сколько секунд не ставить в очередь файл, из которого не удалось
+# создать миниатюры.
+THUMBNAIL_FAILED_TIMEOUT = 60 * 60 * 24
+
 NUM_PAGES = 10
 
+COMMENTS_PER_PAGE = 20
+
+# Число постов в RSS/Atom-лентах.
+SYNDICATION_ITEMS = 20
+
+TIMELINE_LENGTH = 500
+
+FEED_FANOUT_THRESHOLD = 10000
+
+# Посты авторов с большим числом подписчиков раскладываются по лентам
+# в очереди задач, а не в запросе.
+FEED_INLINE_FANOUT = 100
+
+# Очередь задач core.tasks и её воркер manage.py run_worker.
+TASKS_EAGER = False
+
+TASK_WORKERS = 4
+
+TASK_POLL_INTERVAL = 1.0
+
+TASK_LEASE = 60 * 5
+
+TASK_MAX_ATTEMPTS = 5
+
+TASK_RETRY_DELAY = 10
+
+# Лимиты — худший случай, измеренный тестами: вошедший пользователь
+# (сессия и пользователь — 2 запроса), холодные кэши страниц и миниатюр
+# (запрос к хранилищу миниатюр и постановка недостающих в очередь —
+# ещё 2). Изменяющие представления считают и точки сохранения
+# транзакции теста.
+QUERY_BUDGETS = {
+    'posts:index': 5,
+    'posts:group_list': 6,
+    'posts:profile': 7,
+    'posts:post_detail': 7,
+    'posts:follow_index': 7,
+    'posts:comments': 4,
+    'posts:search': 5,
+    'posts:feed_rss': 1,
+    'posts:feed_atom': 1,
+    'posts:group_feed_rss': 2,
+    'posts:group_feed_atom': 2,
+    'posts:profile_feed_rss': 2,
+    'posts:profile_feed_atom': 2,
+    'posts:add_comment': 7,
+    'posts:profile_follow': 15,
+    'posts:profile_unfollow': 11,
+}
+
+# В тестах включается core.runner.TestRunner.
+QUERY_BUDGET_STRICT = False
+
 ROOT_URLCONF = 'yatube.urls'
 
+TEST_RUNNER = 'core.runner.TestRunner'
+
+# Файл кэша общий для процессов сайта на хосте; у каждой копии сайта
+# свой. Тесты (core.runner.TestRunner) берут временный файл.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_PATH', os.path.join(BASE_DIR, 'cache.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
 
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+PAGE_CACHE_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:feed_rss',
+    'posts:feed_atom',
+    'posts:group_feed_rss',
+    'posts:group_feed_atom',
+    'posts:profile_feed_rss',
+    'posts:profile_feed_atom',
+)
+
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
@@ -61,6 +186,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.cache.cache_generation',
             ],
         },
     },